@@ -1,75 +1,11 @@
 from PyQt6 import QtWidgets, QtGui, QtCore
-import sys, random
-from problemGenerator import generate_board , Constraint , Variable, build_csp_problem, is_valid
-from collections import deque
+import sys, random, threading
+from functools import lru_cache
+from problemGenerator import generate_graded, generate_board, GRADES, CLUE_COUNTS, Variable, build_csp_problem, solve_sudoku, SolveCancelled
+from boardHistory import BoardHistory
+from solutionCache import SolutionCache
+from solverLog import open_step_sink
 import time
-def solve_sudoku(variables, constraints):
-    start = time.time()
-    steps = []
-    board_history = [] 
-
-    def select_unassigned_var(variables):
-        unassigned = [v for row in variables for v in row if v.val == 0]
-        if not unassigned:
-            return None
-        return min(unassigned, key=lambda v: len(v.domain))
-
-    def ac3_after_assignment(var):
-        queue = deque([Constraint(var, neighbor) for neighbor in var.neighbors])
-        while queue:
-            con = queue.popleft()
-            if con.resolve():
-                if not con.xi.domain:
-                    return False
-                for neighbor in con.xi.neighbors:
-                    if neighbor != con.xj:
-                        queue.append(Constraint(neighbor, con.xi))
-        return True
-
-    def record_board():
-        board_snapshot = [[variables[r][c].val for c in range(9)] for r in range(9)]
-        board_history.append(board_snapshot)
-
-    def backtrack():
-        var = select_unassigned_var(variables)
-        if var is None:
-            record_board()
-            return True  
-        with open('ac3_log.txt' , 'a') as F:
-            F.write(f"picked X{var.row}{var.col} with minimum domain size {len(var.domain)}\n")
-        board = [[variables[r][c].val for c in range(9)] for r in range(9)]
-        original_domain = var.domain[:]
-        for val in original_domain:
-            if not is_valid(board, var.row,var.col,val):
-                continue
-            var.val = val
-            steps.append(f"Assign X{var.row}{var.col} = {val}")
-            record_board()
-
-            neighbor_domains_backup = {n: n.domain[:] for n in var.neighbors}
-
-            if ac3_after_assignment(var):
-                if backtrack():
-                    return True
-
-            steps.append(f"Backtrack X{var.row}{var.col} from {val}")
-            var.val = 0
-            var.domain = original_domain[:]
-            for n in var.neighbors:
-                n.domain = neighbor_domains_backup[n]
-            record_board()
-
-        return False
-
-    success = backtrack()
-    end = time.time()
-    print(f"elapsed time = {end-start}")
-    if success:
-        solved_board = [[variables[r][c].val for c in range(9)] for r in range(9)]
-        return solved_board, steps, board_history
-    else:
-        return None, steps, board_history
-
 
 # Sudoku Cell Widget
 PASTEL_BG = "#f5f5f5"
@@ -79,10 +15,92 @@ PASTEL_ERROR = "#ffcdd2"
 PASTEL_VALID = "#c8e6c9"  
 PASTEL_ACCENT = "#80cbc4" 
 
+# history playback: frames are drawn every PLAYBACK_FRAME_MS and skip ahead as many
+# steps as the chosen speed (steps per second) covers in that time
+PLAYBACK_FRAME_MS = 33
+PLAYBACK_SPEEDS = (10, 100, 1000, 10000)
+
+# where the search steps of each solve are streamed: STEP_LOG_MODE "text" or "gzip"
+# appends to STEP_LOG, rotated past STEP_LOG_MAX_BYTES with STEP_LOG_BACKUPS old
+# files kept; "none" records nothing
+STEP_LOG_MODE = "text"
+STEP_LOG = "steps.txt"
+STEP_LOG_MAX_BYTES = 16 << 20
+STEP_LOG_BACKUPS = 3
+
+# solutions of boards solved this session, shared by every game; a board symmetric
+# to one already solved (rotated, mirrored, digits swapped, ...) is answered from it
+SOLUTION_CACHE = SolutionCache()
+
+CELL_STATES = {
+    "normal": "background:#ffffff; color:#333; font-weight:normal;",
+    "fixed": f"background:{PASTEL_FIXED}; color:#111; font-weight:bold;",
+    "error": f"background:{PASTEL_ERROR}; color:#d32f2f; font-weight:bold;",
+    "valid": f"background:{PASTEL_VALID}; color:#388e3c; font-weight:bold;",
+}
+
+
+@lru_cache(maxsize=None)
+def cell_style(state, edges):
+    # one stylesheet string per (state, border widths) pair, built once; edges are
+    # the top/left/right/bottom widths: 2 on box lines, 1 inside a box, 0 outside
+    sides = "".join(f"border-{side}:{width}px solid {'#333' if width == 2 else '#999'};"
+                    for side, width in zip(("top", "left", "right", "bottom"), edges))
+    return f"{CELL_STATES[state]} border-radius:3px;{sides}margin:0px;"
+
+
+def cell_edges(r, c):
+    top = 0 if r == 0 else 2 if r % 3 == 0 else 1
+    left = 0 if c == 0 else 2 if c % 3 == 0 else 1
+    right = 0 if c == 8 else 2 if (c + 1) % 3 == 0 else 1
+    bottom = 0 if r == 8 else 2 if (r + 1) % 3 == 0 else 1
+    return top, left, right, bottom
+
+
+class BoardModel:
+    # the values on screen plus how often each value sits in every row, column and
+    # box, so checking a cell for conflicts is three lookups instead of a widget scan
+    def __init__(self, board):
+        self.values = [0] * 81
+        self.rows = [[0] * 10 for _ in range(9)]
+        self.cols = [[0] * 10 for _ in range(9)]
+        self.boxes = [[0] * 10 for _ in range(9)]
+        for i in range(81):
+            self.set(i, board[i // 9][i % 9])
+
+    def set(self, i, val):
+        old = self.values[i]
+        if old == val:
+            return False
+        r, c = divmod(i, 9)
+        b = (r // 3) * 3 + c // 3
+        if old:
+            self.rows[r][old] -= 1
+            self.cols[c][old] -= 1
+            self.boxes[b][old] -= 1
+        if val:
+            self.rows[r][val] += 1
+            self.cols[c][val] += 1
+            self.boxes[b][val] += 1
+        self.values[i] = val
+        return True
+
+    def conflicts(self, i):
+        val = self.values[i]
+        r, c = divmod(i, 9)
+        return bool(val) and (self.rows[r][val] > 1 or self.cols[c][val] > 1
+                              or self.boxes[(r // 3) * 3 + c // 3][val] > 1)
+
+    def board(self):
+        return [self.values[r * 9:r * 9 + 9] for r in range(9)]
+
+
 class SudokuCell(QtWidgets.QLineEdit):
-    def __init__(self, fixed=False):
+    def __init__(self, fixed=False, edges=(1, 1, 1, 1)):
         super().__init__()
         self.fixed = fixed
+        self.edges = edges
+        self.state = None
         self.setFixedSize(55, 55) 
         self.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
         self.setFont(QtGui.QFont("Arial", 20))
@@ -90,17 +108,89 @@ class SudokuCell(QtWidgets.QLineEdit):
         if fixed:
             self.setReadOnly(True)
         self.setMaxLength(1)
+
+    def set_state(self, state):
+        # restyling is the expensive part of a repaint, so it only happens on a change
+        if state != self.state:
+            self.state = state
+            self.setStyleSheet(cell_style(state, self.edges))
+
     def highlight_error(self):
-        self.setStyleSheet(f"background:{PASTEL_ERROR}; color:#d32f2f; border:1px solid #d32f2f; border-radius:3px; font-weight:bold;")
+        self.set_state("error")
 
     def highlight_valid(self):
-        self.setStyleSheet(f"background:{PASTEL_VALID}; color:#388e3c; border:1px solid #388e3c; border-radius:3px; font-weight:bold;")
+        self.set_state("valid")
 
     def reset_style(self):
-        if self.fixed:
-            self.setStyleSheet(f"background:{PASTEL_FIXED}; color:#111; border:1px solid #777; border-radius:3px; font-weight:bold;")
-        else:
-            self.setStyleSheet(f"background:#ffffff; color:#333; border:1px solid #aaa; border-radius:3px; font-weight:normal;")
+        self.set_state("fixed" if self.fixed else "normal")
+
+    def show_value(self, val):
+        # programmatic update: no textChanged, so validate() does not run for it
+        self.blockSignals(True)
+        self.setText(str(val) if val else "")
+        self.blockSignals(False)
+        self.reset_style()
+
+class SolveWorker(QtCore.QObject):
+    # runs solve_sudoku on a QThread; cancel() stops the search at its next node
+    progress = QtCore.pyqtSignal(int, int, float, object)
+    finished = QtCore.pyqtSignal(object, object, object, float)
+    cancelled = QtCore.pyqtSignal()
+
+    def __init__(self, board):
+        super().__init__()
+        self.board = board
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        start = time.time()
+        form, hit, solved = SOLUTION_CACHE.lookup(self.board)
+        if hit:
+            # no search ran: the history just fills in the cached solution cell by cell
+            history = BoardHistory(self.board)
+            if solved is not None:
+                n = len(self.board)
+                for i in range(n * n):
+                    if not self.board[i // n][i % n]:
+                        history.record(i, 0, solved[i // n][i % n])
+            self.finished.emit(solved, history, None, time.time() - start)
+            return
+        variables, constraints = build_csp_problem(self.board)
+        sink = open_step_sink(STEP_LOG_MODE, STEP_LOG, STEP_LOG_MAX_BYTES, STEP_LOG_BACKUPS)
+        try:
+            solved, _, history, stats = solve_sudoku(variables, constraints, record_history=True,
+                                                     progress=self.progress.emit, cancel=self.cancel_event,
+                                                     on_step=None if sink is None else sink.step)
+        except SolveCancelled:
+            self.cancelled.emit()
+            return
+        finally:
+            if sink is not None:
+                sink.close()
+        SOLUTION_CACHE.store(form, solved)
+        self.finished.emit(solved, history, stats, time.time() - start)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+
+class GenerateWorker(QtCore.QObject):
+    # runs generate_graded on a QThread, since an Expert puzzle can take seconds
+    finished = QtCore.pyqtSignal(object)
+
+    def __init__(self, grade):
+        super().__init__()
+        self.grade = grade
+
+    def run(self):
+        try:
+            puzzle = generate_graded(self.grade)
+        except RuntimeError:
+            # no puzzle of exactly this grade within max_tries: fall back to a unique
+            # puzzle with the grade's clue count (Expert has none, so Hard's)
+            puzzle = generate_board(self.grade if self.grade in CLUE_COUNTS else "Hard", unique=True)
+        self.finished.emit(puzzle)
+
 
 class SudokuGame(QtWidgets.QWidget):
     restart_signal = QtCore.pyqtSignal()
@@ -112,17 +202,28 @@ class SudokuGame(QtWidgets.QWidget):
         self.mode = mode
         self.difficulty = difficulty
         self.cells = []
+        self.model = None
+        self.marked = set()
         self.grid_layout = None
         self.board_history = []
         self.history_index = 0
+        self.solver_thread = None
+        self.solver_worker = None
+        self.solver_board = None
+        self.generator_thread = None
+        self.generator_worker = None
+        self.play_from = 0
+        self.play_clock = QtCore.QElapsedTimer()
+        self.play_timer = QtCore.QTimer(self)
+        self.play_timer.setInterval(PLAYBACK_FRAME_MS)
+        self.play_timer.timeout.connect(self.playback_frame)
         
-        if self.mode == 0:
-            self.puzzle = generate_board(self.difficulty)
-            self.editable = False
-        else:
-            self.puzzle = [[0]*9 for _ in range(9)]
-            self.editable = True
+        # mode 0 starts from an empty board that on_generated replaces
+        self.puzzle = [[0]*9 for _ in range(9)]
+        self.editable = self.mode != 0
         self.build_ui()
+        if self.mode == 0:
+            self.start_generator()
 
     def build_ui(self):
         layout = QtWidgets.QVBoxLayout(self)
@@ -169,15 +270,22 @@ class SudokuGame(QtWidgets.QWidget):
             }}
         """
 
-        solve_btn = QtWidgets.QPushButton("Solve")
-        solve_btn.clicked.connect(self.solve)
-        solve_btn.setStyleSheet(button_style)
+        self.solve_btn = QtWidgets.QPushButton("Solve")
+        self.solve_btn.clicked.connect(self.solve)
+        self.solve_btn.setStyleSheet(button_style)
+
+        self.cancel_btn = QtWidgets.QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_solve)
+        self.cancel_btn.setStyleSheet(button_style)
+        self.cancel_btn.setEnabled(False)
 
         restart_btn = QtWidgets.QPushButton("Restart Game")
         restart_btn.clicked.connect(self.restart_signal.emit)
         restart_btn.setStyleSheet(button_style)
 
-        btns.addWidget(solve_btn)
+        btns.addWidget(self.solve_btn)
+        btns.addSpacing(20)
+        btns.addWidget(self.cancel_btn)
         btns.addSpacing(20)
         btns.addWidget(restart_btn)
 
@@ -190,6 +298,10 @@ class SudokuGame(QtWidgets.QWidget):
         h_center_btns.addStretch()
         
         layout.addLayout(h_center_btns)
+
+        self.status_label = QtWidgets.QLabel("")
+        self.status_label.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.status_label)
         
         layout.addStretch() 
         history_layout = QtWidgets.QHBoxLayout()
@@ -197,46 +309,119 @@ class SudokuGame(QtWidgets.QWidget):
         self.next_btn = QtWidgets.QPushButton("Next")
         self.prev_btn.clicked.connect(self.show_prev_board)
         self.next_btn.clicked.connect(self.show_next_board)
+        self.play_btn = QtWidgets.QPushButton("Play")
+        self.play_btn.clicked.connect(self.toggle_playback)
+        self.speed_box = QtWidgets.QComboBox()
+        for speed in PLAYBACK_SPEEDS:
+            self.speed_box.addItem(f"{speed} steps/s", speed)
+        self.speed_box.setCurrentIndex(1)
+        self.speed_box.currentIndexChanged.connect(self.change_speed)
+        self.timeline = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
+        self.timeline.valueChanged.connect(self.seek_history)
         self.prev_btn.setEnabled(False)
         self.next_btn.setEnabled(False)
+        self.play_btn.setEnabled(False)
+        self.timeline.setEnabled(False)
         history_layout.addWidget(self.prev_btn)
+        history_layout.addWidget(self.play_btn)
         history_layout.addWidget(self.next_btn)
+        history_layout.addWidget(self.speed_box)
         layout.addLayout(history_layout)
+        layout.addWidget(self.timeline)
     def show_board(self, board):
-        for r in range(9):
-            for c in range(9):
-                val = board[r][c]
-                cell = self.cells[r][c]
-                if val == 0:
-                    cell.setText("")
-                else:
-                    cell.setText(str(val))
-                cell.reset_style()
+        self.show_flat([val for row in board for val in row])
+
+    def show_flat(self, values):
+        # only cells whose value differs from the model are touched, so stepping
+        # through history repaints one or two cells instead of all 81
+        for i in self.marked:
+            self.cells[i // 9][i % 9].reset_style()
+        self.marked.clear()
+        model = self.model
+        for i, val in enumerate(values):
+            if model.set(i, val):
+                self.cells[i // 9][i % 9].show_value(val)
+
+    def show_history(self, index):
+        # any step is one checkpoint plus a bounded replay away in BoardHistory
+        self.history_index = index
+        self.show_flat(self.board_history.flat(index))
+        self.timeline.blockSignals(True)
+        self.timeline.setValue(index)
+        self.timeline.blockSignals(False)
+
+    def seek_history(self, index):
+        if index != self.history_index:
+            self.show_history(index)
+            if self.play_timer.isActive():
+                self.anchor_playback()
+        self.update_history_buttons()
+
+    def toggle_playback(self):
+        if self.play_timer.isActive():
+            self.pause_playback()
+            return
+        if self.history_index >= len(self.board_history) - 1:
+            self.show_history(0)
+        self.anchor_playback()
+        self.play_timer.start()
+        self.play_btn.setText("Pause")
+        self.update_history_buttons()
+
+    def pause_playback(self):
+        self.play_timer.stop()
+        self.play_btn.setText("Play")
+
+    def anchor_playback(self):
+        # the step shown is worked out from the time since this anchor, so the
+        # speed holds however long each frame takes to draw
+        self.play_from = self.history_index
+        self.play_clock.start()
+
+    def change_speed(self):
+        if self.play_timer.isActive():
+            self.anchor_playback()
+
+    def playback_frame(self):
+        last = len(self.board_history) - 1
+        speed = self.speed_box.currentData()
+        index = min(last, self.play_from + self.play_clock.elapsed() * speed // 1000)
+        if index != self.history_index:
+            self.show_history(index)
+        if index >= last:
+            self.pause_playback()
+        self.update_history_buttons()
 
     def show_prev_board(self):
         if self.history_index > 0:
-            self.history_index -= 1
-            self.show_board(self.board_history[self.history_index])
+            self.show_history(self.history_index - 1)
         self.update_history_buttons()
 
     def show_next_board(self):
         if self.history_index < len(self.board_history) - 1:
-            self.history_index += 1
-            self.show_board(self.board_history[self.history_index])
+            self.show_history(self.history_index + 1)
         self.update_history_buttons()
 
     def update_history_buttons(self):
+        last = len(self.board_history) - 1
         self.prev_btn.setEnabled(self.history_index > 0)
-        self.next_btn.setEnabled(self.history_index < len(self.board_history) - 1)
+        self.next_btn.setEnabled(self.history_index < last)
+        self.play_btn.setEnabled(last > 0)
+        self.timeline.setEnabled(last > 0)
+        self.timeline.blockSignals(True)
+        self.timeline.setRange(0, max(last, 0))
+        self.timeline.setValue(self.history_index)
+        self.timeline.blockSignals(False)
 
     def build_board(self):
         self.cells = []
+        self.model = BoardModel(self.puzzle)
         for r in range(9):
             row = []
             for c in range(9):
                 val = self.puzzle[r][c]
                 fixed = (val != 0 and not self.editable)
-                cell = SudokuCell(fixed=fixed)
+                cell = SudokuCell(fixed=fixed, edges=cell_edges(r, c))
 
                 if val:
                     cell.setText(str(val))
@@ -244,31 +429,6 @@ class SudokuGame(QtWidgets.QWidget):
                     if not fixed:
                         cell.textChanged.connect(lambda text, rr=r, cc=c: self.validate(rr, cc))
 
-                top = 2 if r % 3 == 0 else 1
-                left = 2 if c % 3 == 0 else 1
-                
-                right = 1 if c != 8 and (c+1) % 3 != 0 else 2 if (c+1) % 3 == 0 else 1
-                bottom = 1 if r != 8 and (r+1) % 3 != 0 else 2 if (r+1) % 3 == 0 else 1
-                
-                thick_border = "#333"
-                light_border = "#999"
-
-                cell.setStyleSheet(cell.styleSheet() +
-                    f"border-top:{top}px solid {thick_border if top == 2 else light_border};"
-                    f"border-left:{left}px solid {thick_border if left == 2 else light_border};"
-                    f"border-right:{right}px solid {thick_border if right == 2 else light_border};"
-                    f"border-bottom:{bottom}px solid {thick_border if bottom == 2 else light_border};"
-                    f"margin:0px;") 
-
-                if r == 0:
-                    cell.setStyleSheet(cell.styleSheet().replace(f"border-top:{top}px", "border-top:0px"))
-                if c == 0:
-                    cell.setStyleSheet(cell.styleSheet().replace(f"border-left:{left}px", "border-left:0px"))
-                if r == 8:
-                    cell.setStyleSheet(cell.styleSheet().replace(f"border-bottom:{bottom}px", "border-bottom:0px"))
-                if c == 8:
-                    cell.setStyleSheet(cell.styleSheet().replace(f"border-right:{right}px", "border-right:0px"))
-                    
                 self.grid_layout.addWidget(cell, r, c)
                 row.append(cell)
             self.cells.append(row)
@@ -276,55 +436,143 @@ class SudokuGame(QtWidgets.QWidget):
     # Validation Logic
     def validate(self, r, c):
         cell = self.cells[r][c]
-        val = cell.text().strip()
+        i = r * 9 + c
+        text = cell.text().strip()
+        # Must be digit 1-9
+        val = int(text) if len(text) == 1 and text in "123456789" else 0
+        self.model.set(i, val)
 
-        cell.reset_style()
         # Empty cell
-        if not val:
+        if not text:
+            cell.reset_style()
+            self.marked.discard(i)
             return
-        # Must be digit 1-9
-        if not val.isdigit() or not (1 <= int(val) <= 9):
-            cell.highlight_error(); return
         # Must be unique in row, col, 3×3 subgrid
-        for cc in range(9):
-            if cc != c and self.cells[r][cc].text() == val:
-                cell.highlight_error(); return
-        for rr in range(9):
-            if rr != r and self.cells[rr][c].text() == val:
-                cell.highlight_error(); return
-        sr, sc = (r//3)*3, (c//3)*3
-        for rr in range(sr, sr+3):
-            for cc in range(sc, sc+3):
-                if (rr,cc)!=(r,c) and self.cells[rr][cc].text()==val:
-                    cell.highlight_error(); return
-
-        cell.highlight_valid()
+        if not val or self.model.conflicts(i):
+            cell.highlight_error()
+        else:
+            cell.highlight_valid()
+        self.marked.add(i)
 
     # Solve board
     def solve(self):
-        board = []
+        board = self.model.board()
+        self.marked.clear()
         for r in range(9):
-            row = []
             for c in range(9):
-                t = self.cells[r][c].text()
-                row.append(int(t) if t.isdigit() else 0)
-                if self.cells[r][c].text().isdigit():
-                    cell = self.cells[r][c]
+                cell = self.cells[r][c]
+                if board[r][c]:
                     cell.fixed = True
-                    cell.setReadOnly(True)
-                    cell.reset_style() 
-            board.append(row)
-
-        self.variables, self.constraints = build_csp_problem(board)
-        solved, steps, history = solve_sudoku(self.variables, self.constraints)
-        with open('steps.txt' , 'a') as F:
-            for step in steps:
-                F.write(f"{step}\n")
+                elif cell.text():
+                    cell.show_value(0)
+                # no typing while the worker runs: progress repaints would overwrite
+                # the edit after validate() had already put it in the model
+                cell.setReadOnly(True)
+                cell.reset_style()
+
+        self.solve_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.pause_playback()
+        self.prev_btn.setEnabled(False)
+        self.next_btn.setEnabled(False)
+        self.play_btn.setEnabled(False)
+        self.timeline.setEnabled(False)
+        self.status_label.setText("Solving...")
+
+        self.solver_board = board
+        self.solver_thread = QtCore.QThread()
+        self.solver_worker = SolveWorker(board)
+        self.solver_worker.moveToThread(self.solver_thread)
+        self.solver_thread.started.connect(self.solver_worker.run)
+        self.solver_worker.progress.connect(self.on_solve_progress)
+        self.solver_worker.finished.connect(self.on_solve_finished)
+        self.solver_worker.cancelled.connect(self.on_solve_cancelled)
+        self.solver_thread.start()
+
+    def start_generator(self):
+        for row in self.cells:
+            for cell in row:
+                cell.setReadOnly(True)
+        self.solve_btn.setEnabled(False)
+        self.status_label.setText("Generating...")
+
+        self.generator_thread = QtCore.QThread()
+        self.generator_worker = GenerateWorker(self.difficulty)
+        self.generator_worker.moveToThread(self.generator_thread)
+        self.generator_thread.started.connect(self.generator_worker.run)
+        self.generator_worker.finished.connect(self.on_generated)
+        self.generator_thread.start()
+
+    def finish_generator(self):
+        self.generator_thread.quit()
+        self.generator_thread.wait()
+        self.generator_thread = None
+        self.generator_worker = None
+
+    def on_generated(self, puzzle):
+        self.finish_generator()
+        self.puzzle = puzzle
+        for row in self.cells:
+            for cell in row:
+                self.grid_layout.removeWidget(cell)
+                cell.deleteLater()
+        self.build_board()
+        self.solve_btn.setEnabled(True)
+        self.status_label.setText("")
+
+    def cancel_solve(self):
+        if self.solver_worker is not None:
+            self.cancel_btn.setEnabled(False)
+            self.solver_worker.cancel()
+
+    def stop_solver(self):
+        # stop playback, cancel a running solve and wait for its thread, e.g. before this widget goes away
+        self.pause_playback()
+        if self.generator_thread is not None:
+            # generation cannot be cancelled, so this waits for the puzzle in progress
+            self.generator_worker.finished.disconnect()
+            self.finish_generator()
+        if self.solver_thread is None:
+            return
+        for signal in (self.solver_worker.progress, self.solver_worker.finished, self.solver_worker.cancelled):
+            signal.disconnect()
+        self.solver_worker.cancel()
+        self.finish_solver()
+
+    def finish_solver(self):
+        self.solver_thread.quit()
+        self.solver_thread.wait()
+        self.solver_thread = None
+        self.solver_worker = None
+        for row in self.cells:
+            for cell in row:
+                cell.setReadOnly(cell.fixed)
+        self.solve_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+
+    def on_solve_progress(self, nodes, depth, elapsed, board):
+        self.status_label.setText(f"nodes {nodes}  depth {depth}  {elapsed:.1f}s")
+        self.show_board(board)
+
+    def on_solve_cancelled(self):
+        self.finish_solver()
+        self.show_board(self.solver_board)
+        self.status_label.setText("Solve cancelled.")
+
+    def on_solve_finished(self, solved, history, stats, elapsed):
+        self.finish_solver()
+        if stats is None:
+            self.status_label.setText(f"Finished in {elapsed:.2f}s (from cache)")
+        else:
+            self.status_label.setText(f"Finished in {elapsed:.2f}s: {stats.nodes} nodes, {stats.backtracks} backtracks, "
+                                      f"depth {stats.max_depth}")
         self.board_history = history
         self.history_index = len(history)-1
         self.update_history_buttons()
 
         if solved is None:
+            # progress left a partial search board in the grid
+            self.show_board(self.solver_board)
             QtWidgets.QMessageBox.information(self,"Unsolvable","No solution exists.")
             return
 
@@ -381,7 +629,7 @@ class StartMenu(QtWidgets.QWidget):
         self.mode_box.addItems(["Mode 1 (AI generates)","Mode 2 (User input)"])
 
         self.diff_box = QtWidgets.QComboBox()
-        self.diff_box.addItems(["Easy","Intermediate","Hard"])
+        self.diff_box.addItems(GRADES)
 
         start_btn = QtWidgets.QPushButton("Start Game")
         start_btn.clicked.connect(lambda: self.start_signal.emit(self.mode_box.currentIndex(), self.diff_box.currentText()))
@@ -423,7 +671,14 @@ class MainWindow(QtWidgets.QStackedWidget):
         self.addWidget(self.game)
         self.setCurrentWidget(self.game)
 
+    def closeEvent(self, event):
+        # worker threads must not outlive the window they report to
+        if hasattr(self, "game"):
+            self.game.stop_solver()
+        super().closeEvent(event)
+
     def restart(self):
+        self.game.stop_solver()
         self.setCurrentWidget(self.menu)
         self.removeWidget(self.game)
         del self.game
@@ -0,0 +1,345 @@
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from problemGenerator import (generate_board, generate_puzzles, build_csp_problem, resolve_constraints, solve_sudoku,
+                              solve_board, solve_batch, parse_puzzle, Propagator, SearchOrder, SolveStats)
+from dancingLinks import solve_exact_cover
+
+try:
+    from numpyPropagator import solve_batch_numpy
+except ImportError:
+    solve_batch_numpy = None
+
+RULE_SETS = (
+    (),
+    ("hidden_singles",),
+    ("hidden_singles", "naked_pairs"),
+    ("hidden_singles", "naked_pairs", "pointing_pairs", "box_line", "naked_triples"),
+)
+
+# minimal puzzles from Gordon Royle's 17-clue collection; the last one is the
+# "against brute force" puzzle whose first row is empty and solution starts 987654321
+SEVENTEEN_CLUE = (
+    "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+    "000000010400000000020000000000050604008000300001090000300400200050100000000807000",
+    "000000012000035000000600070700000300000400800100000000000120000080000040050000600",
+    "000000012003600000000007000410020000000500300700000600280000040000300500000000000",
+    "000000012008030000000000040120500000000004700060000000507000300000620000000100000",
+    "..............3.85..1.2.......5.7.....4...1...9.......5......73..2.1........4...9",
+)
+
+# published "hardest" puzzles: Inkala 2012, AI Escargot, Easter Monster and the
+# first few of the top95 set
+HARDEST = (
+    "8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..",
+    "1....7.9..3..2...8..96..5....53..9...1..8...26....4...3......1..4......7..7...3..",
+    "1.......2.9.4...5...6...7...5.9.3.......7.......85..4.7.....6...3...9.8...2.....1",
+    "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......",
+    "52...6.........7.13...........4..8..6......5...........418.........3..2...87.....",
+    "6.....8.3.4.7.................5.4.7.3..2.....1.6.......2.....5.....8.6......1....",
+    "48.3............71.2.......7.5....6....2..8.............1.76...3.....4......5....",
+    "....14....3....2...7..........9...3.6.1.............8.2.....1.4....5.6.....7.8...",
+)
+
+DIFFICULTIES = ("Easy", "Intermediate", "Hard")
+
+# metrics compared between result files; higher is worse for all of them
+COMPARED = ("median_ms", "p99_ms", "nodes", "backtracks", "propagation_calls", "peak_kib")
+
+
+def make_corpus(difficulty, count, seed):
+    random.seed(seed)
+    return [generate_board(difficulty) for _ in range(count)]
+
+
+def suite_corpora(count, seed):
+    # unique-solution puzzles per difficulty from a fixed seed, plus the hard sets
+    corpora = {difficulty: list(generate_puzzles(count, difficulty, seed=seed)) for difficulty in DIFFICULTIES}
+    corpora["17-clue"] = [parse_puzzle(line) for line in SEVENTEEN_CLUE]
+    corpora["hardest"] = [parse_puzzle(line) for line in HARDEST]
+    return corpora
+
+
+def percentile(ordered, fraction):
+    # nearest-rank percentile of an already sorted list
+    rank = max(1, -(-len(ordered) * fraction // 1))
+    return ordered[int(rank) - 1]
+
+
+def measure(items, run, prepare=None, memory_runs=5, repeat=1):
+    # times run(prepare(item)) repeat times per item (prepare is not timed). When run returns a
+    # dict it holds counters, reported as the mean per run. Peak memory is taken in a
+    # separate tracemalloc pass over the first memory_runs items so tracing does
+    # not skew the latencies. As in timeit, the collector is off while timing.
+    latencies = []
+    counters = {}
+    for item in [item for item in items for _ in range(repeat)]:
+        arg = prepare(item) if prepare is not None else item
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            out = run(arg)
+            latencies.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+        if isinstance(out, dict):
+            for name, value in out.items():
+                counters[name] = counters.get(name, 0) + value
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for item in items[:memory_runs]:
+            arg = prepare(item) if prepare is not None else item
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            run(arg)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    ordered = sorted(latencies)
+    result = {
+        "runs": len(ordered),
+        "median_ms": statistics.median(ordered) * 1e3,
+        "p99_ms": percentile(ordered, 0.99) * 1e3,
+        "mean_ms": statistics.fmean(ordered) * 1e3,
+        "peak_kib": peak / 1024,
+    }
+    for name, total in counters.items():
+        result[name] = total / len(ordered)
+    return result
+
+
+def _solve(rules, tie_break="wdeg"):
+    def run(problem):
+        solved, _, _, stats = solve_sudoku(*problem, propagator=Propagator(rules), order=SearchOrder(tie_break))
+        if solved is None:
+            raise RuntimeError("benchmark puzzle has no solution")
+        return {"nodes": stats.nodes, "backtracks": stats.backtracks, "max_depth": stats.max_depth,
+                "propagation_calls": stats.propagation_calls, "revisions": stats.revisions,
+                "removals": stats.removals, "propagation_ms": stats.propagation_seconds * 1e3,
+                "search_ms": stats.search_seconds * 1e3}
+    return run
+
+
+def _solve_dlx(board):
+    stats = SolveStats()
+    if solve_exact_cover(board, stats) is None:
+        raise RuntimeError("benchmark puzzle has no solution")
+    return {"nodes": stats.nodes, "backtracks": stats.backtracks, "max_depth": stats.max_depth}
+
+
+def run_suite(count, seed, memory_runs=5, repeat=1):
+    corpora = suite_corpora(count, seed)
+    results = {}
+    for name, boards in corpora.items():
+        results[f"build_csp_problem/{name}"] = measure(boards, build_csp_problem, None, memory_runs, repeat)
+        results[f"resolve_constraints/{name}"] = measure(boards, lambda problem: resolve_constraints(*problem),
+                                                         build_csp_problem, memory_runs, repeat)
+        results[f"solve_sudoku/{name}"] = measure(boards, _solve(()), build_csp_problem, memory_runs, repeat)
+        results[f"solve_sudoku[hidden_singles]/{name}"] = measure(boards, _solve(("hidden_singles",)),
+                                                                  build_csp_problem, memory_runs, repeat)
+        results[f"solve_sudoku[index]/{name}"] = measure(boards, _solve((), "index"), build_csp_problem,
+                                                         memory_runs, repeat)
+        results[f"dancing_links/{name}"] = measure(boards, _solve_dlx, None, memory_runs, repeat)
+    seeds = random.Random(seed).sample(range(1 << 32), count)
+    for difficulty in DIFFICULTIES:
+        results[f"generate_board/{difficulty}"] = measure(
+            seeds, lambda s: generate_board(difficulty, seed=s), None, memory_runs, repeat)
+        results[f"generate_board[unique]/{difficulty}"] = measure(
+            seeds, lambda s: generate_board(difficulty, unique=True, seed=s), None, memory_runs, repeat)
+    return results
+
+
+def compare(base, new, threshold, min_ms=1.0):
+    # (case, metric, base, new) for every compared metric that grew by more than
+    # threshold (a fraction); latencies must also grow by min_ms so timer noise on
+    # sub-millisecond cases is not flagged. Cases missing from either file are skipped.
+    regressions = []
+    for case, before in base.items():
+        after = new.get(case)
+        if after is None:
+            continue
+        for metric in COMPARED:
+            if metric not in before or metric not in after:
+                continue
+            if metric.endswith("_ms") and after[metric] - before[metric] < min_ms:
+                continue
+            if after[metric] > before[metric] * (1 + threshold):
+                regressions.append((case, metric, before[metric], after[metric]))
+    return regressions
+
+
+def bench_setup_and_propagation(boards):
+    setup = 0.0
+    propagation = 0.0
+    for board in boards:
+        t0 = time.perf_counter()
+        variables, constraints = build_csp_problem(board)
+        t1 = time.perf_counter()
+        resolve_constraints(variables, constraints)
+        t2 = time.perf_counter()
+        setup += t1 - t0
+        propagation += t2 - t1
+    return setup / len(boards), propagation / len(boards)
+
+
+def bench_rules(boards, rules):
+    # per board: search nodes, propagation runs and seconds with these rules
+    propagator = Propagator(rules)
+    nodes = 0
+    start = time.perf_counter()
+    for board in boards:
+        _, _, _, stats = solve_sudoku(*build_csp_problem(board), propagator=propagator)
+        nodes += stats.nodes
+    count = len(boards)
+    return nodes / count, propagator.calls / count, (time.perf_counter() - start) / count
+
+
+def bench_sizes(size, count, seed):
+    # Easy clue density: sparser 25x25 boards fall into heavy-tailed searches
+    rng = random.Random(seed)
+    boards = [generate_board("Easy", rng=rng, size=size) for _ in range(count)]
+    propagator = Propagator(["hidden_singles"])
+    setup = 0.0
+    solve = 0.0
+    for board in boards:
+        t0 = time.perf_counter()
+        build_csp_problem(board)
+        t1 = time.perf_counter()
+        solve_board(board, propagator)
+        t2 = time.perf_counter()
+        setup += t1 - t0
+        solve += t2 - t1
+    return setup / count, solve / count
+
+
+def bench_backends(boards):
+    rates = {}
+    start = time.perf_counter()
+    for _ in solve_batch(boards):
+        pass
+    rates["csp"] = len(boards) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in solve_batch(boards, backend="dlx"):
+        pass
+    rates["dlx"] = len(boards) / (time.perf_counter() - start)
+    if solve_batch_numpy is not None:
+        start = time.perf_counter()
+        for _ in solve_batch_numpy(boards):
+            pass
+        rates["numpy"] = len(boards) / (time.perf_counter() - start)
+    return rates
+
+
+def _run_command(args):
+    results = run_suite(args.count, args.seed, args.memory_runs, args.repeat)
+    report = {
+        "meta": {
+            "count": args.count,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'case':<44}{'median (ms)':>13}{'p99 (ms)':>11}{'nodes':>10}{'prop calls':>12}{'peak (KiB)':>12}")
+    for case, result in results.items():
+        nodes = f"{result['nodes']:.1f}" if "nodes" in result else "-"
+        calls = f"{result['propagation_calls']:.1f}" if "propagation_calls" in result else "-"
+        print(f"{case:<44}{result['median_ms']:>13.3f}{result['p99_ms']:>11.3f}{nodes:>10}{calls:>12}"
+              f"{result['peak_kib']:>12.1f}")
+    print(f"wrote {args.output}")
+
+
+def _compare_command(args):
+    with open(args.base) as f:
+        base = json.load(f)["results"]
+    with open(args.new) as f:
+        new = json.load(f)["results"]
+    for case in sorted(base.keys() ^ new.keys()):
+        print(f"only in {args.base if case in base else args.new}: {case}")
+    regressions = compare(base, new, args.threshold, args.min_ms)
+    for case, metric, before, after in regressions:
+        print(f"REGRESSION {case} {metric}: {before:.3f} -> {after:.3f} ({(after / before - 1) * 100:+.1f}%)")
+    print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def _report_command(args):
+    print(f"{'difficulty':<14}{'setup (us)':>12}{'propagation (us)':>18}")
+    for difficulty in DIFFICULTIES:
+        boards = make_corpus(difficulty, args.count, args.seed)
+        setup, propagation = bench_setup_and_propagation(boards)
+        print(f"{difficulty:<14}{setup * 1e6:>12.1f}{propagation * 1e6:>18.1f}")
+
+    print()
+    print(f"{'difficulty':<14}{'rules':<66}{'nodes':>10}{'prop calls':>12}{'solve (ms)':>12}")
+    for difficulty in ("Intermediate", "Hard"):
+        boards = make_corpus(difficulty, args.count, args.seed)
+        for rules in RULE_SETS:
+            nodes, calls, seconds = bench_rules(boards, rules)
+            print(f"{difficulty:<14}{','.join(rules) or 'AC-3 only':<66}{nodes:>10.1f}{calls:>12.1f}"
+                  f"{seconds * 1e3:>12.2f}")
+
+    print()
+    print(f"{'size':<14}{'setup (ms)':>12}{'solve (ms)':>12}")
+    for size in (9, 16, 25):
+        setup, solve = bench_sizes(size, max(1, args.count // 5), args.seed)
+        print(f"{size}x{size:<11}{setup * 1e3:>12.2f}{solve * 1e3:>12.2f}")
+
+    print()
+    print(f"{'corpus':<14}{'backend':<10}{'puzzles/s':>12}")
+    for name, boards in suite_corpora(args.count, args.seed).items():
+        for backend, rate in bench_backends(boards).items():
+            print(f"{name:<14}{backend:<10}{rate:>12.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the CSP solver and puzzle generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the seeded benchmark suite and write the results as JSON")
+    run.add_argument("-o", "--output", default="benchmark.json")
+    run.add_argument("--count", type=int, default=50, help="puzzles per difficulty (default 50)")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--repeat", type=int, default=1, help="timed runs per puzzle (default 1)")
+    run.add_argument("--memory-runs", type=int, default=5,
+                     help="runs per case repeated under tracemalloc for peak memory (default 5)")
+    run.set_defaults(run=_run_command)
+
+    cmp = commands.add_parser("compare", help="flag regressions between two result files")
+    cmp.add_argument("base")
+    cmp.add_argument("new")
+    cmp.add_argument("--threshold", type=float, default=0.10,
+                     help="relative growth counted as a regression (default 0.10)")
+    cmp.add_argument("--min-ms", type=float, default=1.0,
+                     help="smallest latency increase counted as a regression (default 1.0)")
+    cmp.set_defaults(run=_compare_command)
+
+    report = commands.add_parser("report", help="print setup, rule, size and backend (csp/dlx/numpy) comparison tables")
+    report.add_argument("--count", type=int, default=50)
+    report.add_argument("--seed", type=int, default=0)
+    report.set_defaults(run=_report_command)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+from array import array
+
+
+class BoardHistory:
+    # Sequence of board states stored as one (cell, old, new) delta per step from
+    # the starting board. A full checkpoint is kept every `checkpoint_every`
+    # steps, so history[k] replays at most that many deltas.
+    def __init__(self, board, checkpoint_every=256):
+        self.size = len(board)
+        self.start = bytes(val for row in board for val in row)
+        self.checkpoint_every = checkpoint_every
+        self.cells = array("H")
+        self.old = array("B")
+        self.new = array("B")
+        self.checkpoints = [self.start]
+        self._current = bytearray(self.start)
+
+    def record(self, cell, old, new):
+        self.cells.append(cell)
+        self.old.append(old)
+        self.new.append(new)
+        self._current[cell] = new
+        if len(self.cells) % self.checkpoint_every == 0:
+            self.checkpoints.append(bytes(self._current))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def delta(self, step):
+        return self.cells[step], self.old[step], self.new[step]
+
+    def flat(self, step):
+        # board after delta `step` has been applied, as a flat bytearray
+        if step < 0:
+            step += len(self.cells)
+        if not 0 <= step < len(self.cells):
+            raise IndexError("history step out of range")
+        applied = step + 1
+        base = applied // self.checkpoint_every
+        board = bytearray(self.checkpoints[base])
+        cells = self.cells
+        new = self.new
+        for k in range(base * self.checkpoint_every, applied):
+            board[cells[k]] = new[k]
+        return board
+
+    def __getitem__(self, step):
+        board = self.flat(step)
+        n = self.size
+        return [list(board[r * n:r * n + n]) for r in range(n)]
@@ -0,0 +1,177 @@
+from array import array
+from functools import lru_cache
+from math import isqrt
+
+# Exact-cover backend: an n x n board is n^3 candidate rows (cell, value) over 4n^2
+# constraint columns (cell filled, value once per row, column and box), 729 x 324
+# for 9x9, solved with Knuth's Algorithm X on dancing links. The links live in flat
+# int arrays indexed by node number instead of node objects: node 0 is the root,
+# nodes 1..4n^2 the column headers and candidate row k owns the four nodes from
+# 1 + 4n^2 + 4k. The arrays are built once per size and copied for each solve.
+
+
+class _Matrix:
+    def __init__(self, size):
+        box = isqrt(size)
+        if box < 2 or box * box != size:
+            raise ValueError(f"unsupported board size {size}, expected 4, 9, 16 or 25")
+        n2 = size * size
+        columns = 4 * n2
+        self.size = size
+        self.base = columns + 1
+        nodes = self.base + 4 * size * n2
+        self.left = array("i", range(-1, nodes - 1))
+        self.right = array("i", range(1, nodes + 1))
+        self.up = array("i", range(nodes))
+        self.down = array("i", range(nodes))
+        self.column = array("i", range(nodes))
+        self.count = array("i", bytes(4 * (columns + 1)))
+        self.left[0] = columns
+        self.right[columns] = 0
+
+        x = self.base
+        for cell in range(n2):
+            r, c = divmod(cell, size)
+            b = (r // box) * box + c // box
+            for d in range(size):
+                for k, col in enumerate((cell, n2 + r * size + d, 2 * n2 + c * size + d, 3 * n2 + b * size + d)):
+                    node = x + k
+                    header = col + 1
+                    self.column[node] = header
+                    self.left[node] = x + (k - 1) % 4
+                    self.right[node] = x + (k + 1) % 4
+                    self.up[node] = self.up[header]
+                    self.down[node] = header
+                    self.down[self.up[header]] = node
+                    self.up[header] = node
+                    self.count[header] += 1
+                x += 4
+
+
+@lru_cache(maxsize=None)
+def _matrix(size):
+    return _Matrix(size)
+
+
+def exact_cover_solutions(board, stats=None):
+    # yields every solution of board as a flat list of values; stats (e.g. a
+    # SolveStats) counts rows tried as nodes and rows undone as backtracks
+    n = len(board)
+    matrix = _matrix(n)
+    L = list(matrix.left)
+    R = list(matrix.right)
+    U = list(matrix.up)
+    D = list(matrix.down)
+    S = list(matrix.count)
+    C = matrix.column
+    base = matrix.base
+
+    def cover(c):
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(c):
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+
+    values = [val for row in board for val in row]
+    covered = bytearray(base)
+    for cell, val in enumerate(values):
+        if val:
+            x = base + 4 * (cell * n + val - 1)
+            for j in range(x, x + 4):
+                if covered[C[j]]:
+                    return
+                covered[C[j]] = 1
+                cover(C[j])
+
+    stack = []
+    while True:
+        c = R[0]
+        if c == 0:
+            solution = values[:]
+            for x in stack:
+                row = (x - base) >> 2
+                solution[row // n] = row % n + 1
+            yield solution
+        else:
+            # the column with the fewest rows left, stopping early at 0 or 1
+            best = c
+            fewest = S[c]
+            c = R[c]
+            while c and fewest > 1:
+                if S[c] < fewest:
+                    best = c
+                    fewest = S[c]
+                c = R[c]
+            if fewest:
+                cover(best)
+                x = D[best]
+                j = R[x]
+                while j != x:
+                    cover(C[j])
+                    j = R[j]
+                stack.append(x)
+                if stats is not None:
+                    stats.nodes += 1
+                    stats.max_depth = max(stats.max_depth, len(stack))
+                continue
+
+        # backtrack: undo the last row and try the next one in its column
+        while stack:
+            x = stack.pop()
+            if stats is not None:
+                stats.backtracks += 1
+            j = L[x]
+            while j != x:
+                uncover(C[j])
+                j = L[j]
+            c = C[x]
+            x = D[x]
+            if x != c:
+                j = R[x]
+                while j != x:
+                    cover(C[j])
+                    j = R[j]
+                stack.append(x)
+                if stats is not None:
+                    stats.nodes += 1
+                break
+            uncover(c)
+        else:
+            return
+
+
+def solve_exact_cover(board, stats=None):
+    # same contract as problemGenerator.solve_board: solved board or None
+    for solution in exact_cover_solutions(board, stats):
+        n = len(board)
+        return [solution[r * n:r * n + n] for r in range(n)]
+    return None
+
+
+def count_exact_cover(board, limit=None):
+    count = 0
+    for _ in exact_cover_solutions(board):
+        count += 1
+        if count == limit:
+            break
+    return count
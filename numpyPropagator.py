@@ -0,0 +1,124 @@
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from problemGenerator import CSPState, Propagator, geometry, _solutions
+
+# Batch propagation backend: B boards of one size are held as a (B, cells, n)
+# boolean candidate tensor, and naked/hidden singles run as array operations over
+# the whole batch until it stops changing. Boards left with open cells are handed
+# to the scalar search in problemGenerator, seeded with the reduced domains.
+
+
+@lru_cache(maxsize=None)
+def _tables(size):
+    geo = geometry(size)
+    units = np.array(geo.units, dtype=np.intp)
+    cell_units = [[] for _ in range(geo.cells)]
+    for u, unit in enumerate(geo.units):
+        for pos, i in enumerate(unit):
+            cell_units[i].append((u, pos))
+    cell_units = np.array(cell_units, dtype=np.intp)
+    return units, cell_units[:, :, 0], cell_units[:, :, 1]
+
+
+def candidates(values, size):
+    # (B, cells) givens -> (B, cells, n) candidates, all values open on empty cells
+    values = np.asarray(values)
+    cand = np.zeros(values.shape + (size,), dtype=bool)
+    empty = values == 0
+    cand[empty] = True
+    b, c = np.nonzero(~empty)
+    cand[b, c, values[b, c] - 1] = True
+    return cand
+
+
+def _step(cand, units, cell_unit, cell_pos):
+    # one round of naked and hidden singles; returns the new candidates and a
+    # per-board contradiction flag
+    single = cand.sum(axis=2) == 1
+    fixed = cand & single[:, :, None]
+    fixed_per_unit = fixed[:, units, :].sum(axis=2)
+    dead = (fixed_per_unit > 1).any(axis=(1, 2))
+
+    # naked singles: drop values fixed anywhere in one of the cell's units
+    taken = (fixed_per_unit[:, cell_unit, :] > 0).any(axis=2)
+    cand = cand & ~(taken & ~fixed)
+
+    # hidden singles: a value with one place left in a unit goes there
+    in_unit = cand[:, units, :]
+    counts = in_unit.sum(axis=2)
+    dead |= (counts == 0).any(axis=(1, 2))
+    only = in_unit & (counts == 1)[:, :, None, :]
+    forced = only[:, cell_unit, cell_pos, :].any(axis=2)
+    hidden = forced.any(axis=2)
+    dead |= forced.sum(axis=2).max(axis=1) > 1
+    cand = np.where(hidden[:, :, None], forced, cand)
+
+    dead |= ~cand.any(axis=2).all(axis=1)
+    return cand, dead
+
+
+def propagate_batch(cand, size):
+    # runs singles to a fixpoint on every board; returns (candidates, dead) where
+    # dead marks boards that hit a contradiction
+    units, cell_unit, cell_pos = _tables(size)
+    dead = np.zeros(len(cand), dtype=bool)
+    active = np.arange(len(cand))
+    while len(active):
+        before = cand[active]
+        after, failed = _step(before, units, cell_unit, cell_pos)
+        cand[active] = after
+        dead[active] |= failed
+        changed = (after != before).any(axis=(1, 2))
+        active = active[changed & ~failed]
+    return cand, dead
+
+
+def _masks(cand, size):
+    return cand.astype(np.int64) @ (1 << np.arange(size, dtype=np.int64))
+
+
+def _solve_group(boards, size, propagator, order):
+    start = time.perf_counter()
+    values = np.array([[val for row in board for val in row] for board in boards], dtype=np.int64)
+    cand, dead = propagate_batch(candidates(values, size), size)
+    done = ~dead & (cand.sum(axis=2) == 1).all(axis=1)
+    solved_values = (cand.argmax(axis=2) + 1).tolist()
+    masks = _masks(cand, size).tolist()
+    share = (time.perf_counter() - start) / len(boards)
+
+    for k, board in enumerate(boards):
+        if dead[k]:
+            yield board, None, share
+        elif done[k]:
+            row = solved_values[k]
+            yield board, [row[r * size:r * size + size] for r in range(size)], share
+        else:
+            t0 = time.perf_counter()
+            state = CSPState(board)
+            state.domains = masks[k]
+            solved = None
+            for _ in _solutions(state, propagator, order=order):
+                solved = state.board()
+                break
+            yield board, solved, share + time.perf_counter() - t0
+
+
+def solve_batch_numpy(puzzles, batch_size=4096, propagator=None, order=None):
+    # same (board, solution, seconds) stream as problemGenerator.solve_batch; boards
+    # are propagated batch_size at a time, seconds is the board's share of the batch
+    # propagation plus its own scalar search
+    if propagator is None:
+        propagator = Propagator()
+    group = []
+    size = 0
+    for board in puzzles:
+        if group and (len(board) != size or len(group) == batch_size):
+            yield from _solve_group(group, size, propagator, order)
+            group = []
+        size = len(board)
+        group.append(board)
+    if group:
+        yield from _solve_group(group, size, propagator, order)
@@ -1,26 +1,194 @@
+import argparse
+import os
 import random
+import struct
+import sys
+import time
+from array import array
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import combinations, islice
+from math import isqrt
+
+from boardHistory import BoardHistory
+from dancingLinks import solve_exact_cover
+from solutionCache import SolutionCache
+from solverLog import TraceSink
+
+# cell symbols of the text format: 1-9 then letters for 16x16 and 25x25 boards
+SYMBOLS = "123456789ABCDEFGHIJKLMNOP"
+
+
+def value_bit(val):
+    return 1 << (val - 1)
+
+
+def domain_values(domain):
+    values = []
+    while domain:
+        low = domain & -domain
+        values.append(low.bit_length())
+        domain ^= low
+    return values
+
+
+# values encoded by every possible 9-bit domain, so iterating a domain is a lookup
+DOMAIN_VALUES = tuple(tuple(domain_values(mask)) for mask in range(1 << 9))
+
+
+def domain_size(domain):
+    return domain.bit_count()
+
+
+def is_singleton(domain):
+    return domain != 0 and domain & (domain - 1) == 0
+
+
+class Geometry:
+    # static index tables for an n x n board with sqrt(n) x sqrt(n) boxes: the distinct
+    # peers of every cell, every (xi, xj) arc between peers, the rows/columns/boxes and
+    # every box/line intersection as (segment, rest of the box, rest of the line)
+    def __init__(self, size):
+        box = isqrt(size)
+        if box < 2 or box * box != size or size > len(SYMBOLS):
+            raise ValueError(f"unsupported board size {size}, expected 4, 9, 16 or 25")
+        self.size = size
+        self.box = box
+        self.cells = size * size
+        self.all_values = (1 << size) - 1
+        self.values_of = DOMAIN_VALUES.__getitem__ if size <= 9 else domain_values
+
+        self.rows = tuple(tuple(r * size + c for c in range(size)) for r in range(size))
+        self.cols = tuple(tuple(r * size + c for r in range(size)) for c in range(size))
+        self.boxes = tuple(tuple((br + r) * size + bc + c for r in range(box) for c in range(box))
+                           for br in range(0, size, box) for bc in range(0, size, box))
+        self.units = self.rows + self.cols + self.boxes
+
+        peers = []
+        for i in range(self.cells):
+            r, c = divmod(i, size)
+            cells = set(self.rows[r]) | set(self.cols[c]) | set(self.boxes[(r // box) * box + c // box])
+            cells.discard(i)
+            peers.append(tuple(sorted(cells)))
+        self.peers = tuple(peers)
+        self.arcs = tuple((i, j) for i in range(self.cells) for j in self.peers[i])
+
+        intersections = []
+        for box_cells in self.boxes:
+            for line in self.rows + self.cols:
+                segment = set(box_cells) & set(line)
+                if segment:
+                    intersections.append((tuple(sorted(segment)),
+                                          tuple(i for i in box_cells if i not in segment),
+                                          tuple(i for i in line if i not in segment)))
+        self.intersections = tuple(intersections)
+
+
+@lru_cache(maxsize=None)
+def geometry(size=9):
+    return Geometry(size)
+
+
+# the classic 9x9 tables, built once at import: 20 distinct peers per cell, 1620 arcs,
+# 27 units and 54 box/line intersections
+GEOMETRY = geometry(9)
+ALL_VALUES = GEOMETRY.all_values
+PEERS = GEOMETRY.peers
+ARCS = GEOMETRY.arcs
+ROWS = GEOMETRY.rows
+COLS = GEOMETRY.cols
+BOXES = GEOMETRY.boxes
+UNITS = GEOMETRY.units
+INTERSECTIONS = GEOMETRY.intersections
+
+
+class CSPState:
+    # flat per-cell storage shared by all Variables of one board:
+    # domains[i] is an n-bit mask (bit v-1 set <=> v allowed), values[i] the assigned value.
+    # trail logs (cell, previous domain) for every domain change so search can roll back.
+    def __init__(self, board):
+        self.geo = geometry(len(board))
+        self.values = [val for row in board for val in row]
+        self.domains = [value_bit(val) if val else self.geo.all_values for val in self.values]
+        self.trail = []
+
+    def board(self):
+        n = self.geo.size
+        return [self.values[r * n:r * n + n] for r in range(n)]
+
+    def mark(self):
+        return len(self.trail)
+
+    def undo(self, mark):
+        trail = self.trail
+        domains = self.domains
+        while len(trail) > mark:
+            i, domain = trail.pop()
+            domains[i] = domain
+
+    def assign(self, i, val):
+        self.trail.append((i, self.domains[i]))
+        self.domains[i] = value_bit(val)
+        self.values[i] = val
+
 
 class Variable:
-    def __init__(self, row, col, val=0):
+    def __init__(self, row, col, val=0, state=None):
+        if state is None:
+            state = CSPState(create_empty_board())
+            state.values[row * 9 + col] = val
+            state.domains[row * 9 + col] = value_bit(val) if val else ALL_VALUES
+        self.state = state
+
         self.row = row
         self.col = col
-        self.val = val
-
-        if val == 0:
-            self.domain = [x for x in range(1, 10)]
-        else:
-            self.domain = [val]
+        self.index = row * state.geo.size + col
 
         self.neighbors = set()
 
+    @property
+    def val(self):
+        return self.state.values[self.index]
+
+    @val.setter
+    def val(self, val):
+        self.state.values[self.index] = val
+
+    @property
+    def domain(self):
+        return self.state.domains[self.index]
+
+    @domain.setter
+    def domain(self, domain):
+        self.state.domains[self.index] = domain
+
+    def values(self):
+        return self.state.geo.values_of(self.domain)
+
+    def domain_size(self):
+        return self.domain.bit_count()
+
+    def is_singleton(self):
+        return is_singleton(self.domain)
+
     def remove_from_domain(self, val):
-        if val in self.domain:
-            self.domain.remove(val)
+        self.domain &= ~value_bit(val)
 
     def add_neighbor(self, xj):
         self.neighbors.add(xj)
 
+# optional TraceSink receiving AC-3 and search events; None keeps the solver free of I/O
+_trace = None
+
+
+def set_trace_sink(sink):
+    global _trace
+    previous = _trace
+    _trace = sink
+    return previous
+
+
 class Constraint:
     def __init__(self, xi, xj):
         self.xi = xi
@@ -28,77 +196,351 @@ class Constraint:
         xi.add_neighbor(xj)
 
     def resolve(self):
-        removed = False
-        original_domain = self.xi.domain[:]
-        removed_elements = []
-        for val in original_domain:
-            if all(val == other for other in self.xj.domain):
-                self.xi.domain.remove(val)
-                removed_elements.append(val)
-                removed = True
+        return revise(self.xi.state, self.xi.index, self.xj.index)
+
+
+def revise(state, i, j):
+    # cell i loses a value only when cell j is fixed to that single value
+    domains = state.domains
+    dj = domains[j]
+    if dj & (dj - 1) or not domains[i] & dj:
+        return False
+
+    original_domain = domains[i]
+    state.trail.append((i, original_domain))
+    domains[i] = original_domain & ~dj
+    if _trace is not None:
+        _trace.revise(i, j, original_domain, domains[i], state.geo.size)
+
+    return True
+
+
+def eliminate(state, cells):
+    # AC-3 specialised to the != arcs: revising (k, j) can only change k once j is
+    # a singleton, so queue singleton cells and strip their value from every peer.
+    # Reaches the same fixpoint as propagate() over ARCS without the arc queue.
+    domains = state.domains
+    trail = state.trail
+    peers = state.geo.peers
+    stack = list(cells)
+    while stack:
+        j = stack.pop()
+        bit = domains[j]
+        for k in peers[j]:
+            dk = domains[k]
+            if dk & bit:
+                trail.append((k, dk))
+                domains[k] = dk ^ bit
+                if _trace is not None:
+                    _trace.revise(k, j, dk, dk ^ bit, state.geo.size)
+                dk ^= bit
+                if not dk & (dk - 1):
+                    if not dk:
+                        return False
+                    stack.append(k)
+    return True
+
+
+def propagate(state, queue):
+    # AC-3 over cell-index arcs; re-queues (k, i) for every peer k of a revised cell i
+    domains = state.domains
+    peers = state.geo.peers
+    while queue:
+        i, j = queue.popleft()
+        if revise(state, i, j):
+            if not domains[i]:
+                return False
+            for k in peers[i]:
+                if k != j:
+                    queue.append((k, i))
+    return True
+
+
+
+# Inference rules run by a Propagator on top of AC-3. Each narrows domains through
+# the trail and returns how many values it removed, or -1 on a contradiction.
+
+def _remove_values(state, cells, mask):
+    domains = state.domains
+    trail = state.trail
+    removed = 0
+    for i in cells:
+        d = domains[i]
+        if d & mask:
+            if not d & ~mask:
+                return -1
+            trail.append((i, d))
+            domains[i] = d & ~mask
+            removed += (d & mask).bit_count()
+    return removed
+
 
-        if removed:
-            with open("ac3_log.txt", "a") as f:
-                f.write(f"({self.xi.row}{self.xi.col},{self.xj.row}{self.xj.col}) "
-                        f"xij domain changed from {original_domain} -> {self.xi.domain}, "
-                        f"removed elements {removed_elements}\n")
+def hidden_singles(state):
+    # a value that fits only one cell of a unit must go there
+    domains = state.domains
+    trail = state.trail
+    all_values = state.geo.all_values
+    removed = 0
+    for unit in state.geo.units:
+        once = twice = 0
+        for i in unit:
+            d = domains[i]
+            twice |= once & d
+            once |= d
+        if once != all_values:
+            return -1
+        exactly = once & ~twice
+        if not exactly:
+            continue
+        for i in unit:
+            d = domains[i]
+            hit = d & exactly
+            if hit and hit != d:
+                if hit & (hit - 1):
+                    return -1
+                trail.append((i, d))
+                domains[i] = hit
+                removed += (d ^ hit).bit_count()
+    return removed
+
+
+def _naked_subsets(state, size):
+    # `size` cells of a unit sharing exactly `size` values take those values from the rest
+    domains = state.domains
+    removed = 0
+    for unit in state.geo.units:
+        open_cells = [i for i in unit if 1 < domains[i].bit_count() <= size]
+        if len(open_cells) < size:
+            continue
+        for group in combinations(open_cells, size):
+            union = 0
+            for i in group:
+                union |= domains[i]
+            count = union.bit_count()
+            if count < size:
+                return -1
+            if count == size:
+                n = _remove_values(state, [i for i in unit if i not in group], union)
+                if n < 0:
+                    return -1
+                removed += n
+    return removed
+
+
+def naked_pairs(state):
+    return _naked_subsets(state, 2)
+
+
+def naked_triples(state):
+    return _naked_subsets(state, 3)
+
+
+def pointing_pairs(state):
+    # values of a box confined to one row/column segment leave the rest of that line
+    domains = state.domains
+    removed = 0
+    for segment, box_rest, line_rest in state.geo.intersections:
+        seg = rest = 0
+        for i in segment:
+            seg |= domains[i]
+        for i in box_rest:
+            rest |= domains[i]
+        if seg & ~rest:
+            n = _remove_values(state, line_rest, seg & ~rest)
+            if n < 0:
+                return -1
+            removed += n
+    return removed
+
+
+def box_line_reduction(state):
+    # values of a row/column confined to one box segment leave the rest of that box
+    domains = state.domains
+    removed = 0
+    for segment, box_rest, line_rest in state.geo.intersections:
+        seg = rest = 0
+        for i in segment:
+            seg |= domains[i]
+        for i in line_rest:
+            rest |= domains[i]
+        if seg & ~rest:
+            n = _remove_values(state, box_rest, seg & ~rest)
+            if n < 0:
+                return -1
+            removed += n
+    return removed
+
+
+# cheapest first: the Propagator restarts from the top after any rule fires
+INFERENCE_RULES = {
+    "hidden_singles": hidden_singles,
+    "naked_pairs": naked_pairs,
+    "pointing_pairs": pointing_pairs,
+    "box_line": box_line_reduction,
+    "naked_triples": naked_triples,
+}
+
+
+class RuleStats:
+    def __init__(self):
+        self.calls = 0
+        self.fired = 0
+        self.removals = 0
+        self.contradictions = 0
+        self.seconds = 0.0
 
-        return removed
+    def as_dict(self):
+        return dict(vars(self))
 
 
+class SolveStats:
+    # counters for one solve: nodes are values tried, backtracks values undone after
+    # they (or their subtree) failed, revisions the domain changes propagation made
+    # and removals the values those changes took out. seconds covers the whole
+    # solve, propagation_seconds the part spent propagating.
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.propagation_calls = 0
+        self.revisions = 0
+        self.removals = 0
+        self.propagation_seconds = 0.0
+        self.seconds = 0.0
 
-def create_empty_board():
-    return [[0 for _ in range(9)] for _ in range(9)]
+    @property
+    def search_seconds(self):
+        return self.seconds - self.propagation_seconds
+
+    def as_dict(self):
+        stats = dict(vars(self))
+        stats["search_seconds"] = self.search_seconds
+        return stats
+
+
+def _removed_since(state, mark):
+    # values removed by the domain changes logged on the trail after mark
+    domains = state.domains
+    first = {}
+    for i, domain in state.trail[mark:]:
+        first.setdefault(i, domain)
+    return sum(domain.bit_count() - domains[i].bit_count() for i, domain in first.items())
+
+
+def _counted(propagate_fn, state, work, stats, cell=-1, on_propagate=None):
+    # runs propagate_fn(state, work) and adds its cost to stats;
+    # on_propagate(cell, ok, revisions, seconds) sees each run, cell -1 for the initial one
+    mark = len(state.trail)
+    start = time.perf_counter()
+    ok = propagate_fn(state, work)
+    seconds = time.perf_counter() - start
+    revisions = len(state.trail) - mark
+    stats.propagation_calls += 1
+    stats.propagation_seconds += seconds
+    stats.revisions += revisions
+    stats.removals += _removed_since(state, mark)
+    if on_propagate is not None:
+        on_propagate(cell, ok, revisions, seconds)
+    return ok
+
+
+class Propagator:
+    # AC-3 (eliminate) followed by the chosen inference rules, repeated to a joint
+    # fixpoint. rules are INFERENCE_RULES names or callables with the same contract;
+    # calls counts propagation runs and stats holds a RuleStats per rule.
+    def __init__(self, rules=()):
+        self.rules = []
+        for rule in rules:
+            if isinstance(rule, str):
+                if rule not in INFERENCE_RULES:
+                    raise ValueError(f"unknown inference rule {rule!r}, expected one of {list(INFERENCE_RULES)}")
+                rule = INFERENCE_RULES[rule]
+            self.rules.append(rule)
+        self.calls = 0
+        self.stats = {rule.__name__: RuleStats() for rule in self.rules}
+
+    def __call__(self, state, cells):
+        self.calls += 1
+        if not eliminate(state, cells):
+            return False
+        if not self.rules:
+            return True
+        domains = state.domains
+        trail = state.trail
+        rules = [(rule, self.stats[rule.__name__]) for rule in self.rules]
+        k = 0
+        while k < len(rules):
+            rule, stats = rules[k]
+            mark = len(trail)
+            start = time.perf_counter()
+            removed = rule(state)
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            if removed < 0:
+                stats.contradictions += 1
+                return False
+            if not removed:
+                k += 1
+                continue
+            stats.fired += 1
+            stats.removals += removed
+            singles = [i for i, _ in trail[mark:] if is_singleton(domains[i])]
+            if not eliminate(state, singles):
+                return False
+            k = 0
+        return True
+
+
+def create_empty_board(size=9):
+    return [[0 for _ in range(size)] for _ in range(size)]
 
 
 def is_valid(board, r, c, val):
     if (val == 0):
         return True
-    if any(board[r][x] == val for x in range(9)):
+    n = len(board)
+    if any(board[r][x] == val for x in range(n)):
         return False
-    if any(board[x][c] == val for x in range(9)):
+    if any(board[x][c] == val for x in range(n)):
         return False
 
-    sr = (r // 3) * 3
-    sc = (c // 3) * 3
-    for i in range(3):
-        for j in range(3):
+    box = isqrt(n)
+    sr = (r // box) * box
+    sc = (c // box) * box
+    for i in range(box):
+        for j in range(box):
             if board[sr + i][sc + j] == val:
                 return False
     return True
 
 
-def generate_board(difficulty):
-    clue_counts = {
-        "Easy": 45,
-        "Intermediate": 33,
-        "Hard": 17
-    }
-    clues = clue_counts[difficulty]
+CLUE_COUNTS = {
+    "Easy": 45,
+    "Intermediate": 33,
+    "Hard": 17
+}
 
-    board = create_empty_board()
 
-    def fill_board():
-        for r in range(9):
-            for c in range(9):
-                if board[r][c] == 0:
-                    numbers = list(range(1, 10))
-                    random.shuffle(numbers)
-                    for val in numbers:
-                        if is_valid(board, r, c, val):
-                            board[r][c] = val
-                            if fill_board():
-                                return True
-                            board[r][c] = 0
-                    return False
-        return True  
-
-    fill_board()
-
-    cells_to_remove = 81 - clues
+def generate_board(difficulty, unique=False, seed=None, rng=None, size=9, deadline=None):
+    # unique=True only removes a clue while the puzzle keeps exactly one solution and
+    # stops at the first minimal puzzle, so "Hard" ends above 17 clues in practice.
+    # seed (or a random.Random passed as rng) makes generation reproducible.
+    # Larger boards keep the same fraction of clues as the 9x9 CLUE_COUNTS.
+    # Past deadline (a time.time() value) generation raises SolveCancelled.
+    if rng is None:
+        rng = random if seed is None else random.Random(seed)
+    cells = size * size
+    clues = round(CLUE_COUNTS[difficulty] * cells / 81)
+
+    board = _random_solution(size, rng, deadline)
+
+    if unique:
+        return _remove_clues_keeping_unique(board, clues, rng, deadline)
+
+    cells_to_remove = cells - clues
     while cells_to_remove > 0:
-        r = random.randint(0, 8)
-        c = random.randint(0, 8)
+        r = rng.randint(0, size - 1)
+        c = rng.randint(0, size - 1)
         if board[r][c] != 0:
             board[r][c] = 0
             cells_to_remove -= 1
@@ -106,6 +548,70 @@ def generate_board(difficulty):
     return board
 
 
+def _random_solution(size, rng, deadline=None):
+    # a uniformly shuffled search over the empty board; hidden singles keep the
+    # larger sizes from wandering into deep dead ends
+    state = CSPState(create_empty_board(size))
+    engine = SearchEngine(state, Propagator(["hidden_singles"]) if size > 9 else None, rng=rng)
+    if _run_until(engine, deadline) == SOLUTION:
+        return state.board()
+
+
+def _remove_clues_keeping_unique(board, clues, rng, deadline=None):
+    size = len(board)
+    cells = list(range(size * size))
+    rng.shuffle(cells)
+    remaining = size * size
+    for i in cells:
+        if remaining <= clues:
+            break
+        r, c = divmod(i, size)
+        val = board[r][c]
+        board[r][c] = 0
+        if count_solutions(board, 2, deadline=deadline) == 1:
+            remaining -= 1
+        else:
+            board[r][c] = val
+    return board
+
+
+def _generate_seeded(difficulty, unique, seed, size=9, graded=False, deadline=None):
+    if graded:
+        return generate_graded(difficulty, seed=seed, size=size, deadline=deadline)
+    return generate_board(difficulty, unique=unique, seed=seed, size=size, deadline=deadline)
+
+
+def _generate_chunk(difficulty, unique, seeds, size, graded, deadline):
+    return [_generate_seeded(difficulty, unique, puzzle_seed, size, graded, deadline) for puzzle_seed in seeds]
+
+
+def generate_puzzles(count, difficulty, unique=True, seed=None, workers=1, size=9, graded=False, deadline=None):
+    # every puzzle gets its own seed drawn from `seed`, so a run is reproducible
+    # whatever the number of worker processes. graded=True takes difficulty as a
+    # GRADES name and generates by measured grade instead of clue count. deadline
+    # (a time.time() value) bounds the whole run, see generate_board
+    # Workers get seeds 16 at a time with at most a few chunks per worker in
+    # flight, so a large count is neither submitted nor buffered all at once
+    rng = random.Random(seed)
+    seeds = (rng.getrandbits(64) for _ in range(count))
+    if workers == 1:
+        for puzzle_seed in seeds:
+            yield _generate_seeded(difficulty, unique, puzzle_seed, size, graded, deadline)
+        return
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            chunk = list(islice(seeds, 16))
+            if not chunk:
+                break
+            pending.append(pool.submit(_generate_chunk, difficulty, unique, chunk, size, graded, deadline))
+            if len(pending) >= workers * 4:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
 def user_input_board():
     board = create_empty_board()
     print_board(board)
@@ -127,78 +633,824 @@ def user_input_board():
 
 
 def print_board(board):
-    for r in range(9):
-        if r % 3 == 0 and r != 0:
-            print("-" * 21)
+    n = len(board)
+    box = isqrt(n)
+    for r in range(n):
+        if r % box == 0 and r != 0:
+            print("-" * (2 * n + 2 * (box - 1) - 1))
 
-        for c in range(9):
-            if c % 3 == 0 and c != 0:
+        for c in range(n):
+            if c % box == 0 and c != 0:
                 print("|", end=" ")
 
-            print(board[r][c] if board[r][c] != 0 else ".", end=" ")
+            print(SYMBOLS[board[r][c] - 1] if board[r][c] != 0 else ".", end=" ")
 
         print()
 
 
 def print_variables(variables):
-    for r in range(9):
-        for c in range(9):
-            v = variables[r][c]
-            print(f"X{v.row}{v.col} -> {v.domain}")
+    for row in variables:
+        for v in row:
+            print(f"X{v.row}{v.col} -> {list(v.values())}")
 
 
-def print_constraints(constraints):
-    for con in constraints:
-        xi = con.xi
-        xj = con.xj
-        print(f"(X{xi.row}{xi.col}, X{xj.row}{xj.col})")
+def print_constraints(constraints, size=9):
+    for i, j in constraints:
+        print(f"(X{i // size}{i % size}, X{j // size}{j % size})")
 
 
 def build_csp_problem(board):
-    variables = [[Variable(r, c, board[r][c]) for c in range(9)] for r in range(9)]
-    constraints = []
+    state = CSPState(board)
+    n = state.geo.size
+    cells = [Variable(r, c, state=state) for r in range(n) for c in range(n)]
+    for var in cells:
+        var.neighbors = {cells[j] for j in state.geo.peers[var.index]}
+    variables = [cells[r * n:r * n + n] for r in range(n)]
+    return variables, state.geo.arcs
+
 
-    for r in range(9):
-        for c in range(9):
-            Xi = variables[r][c]
+def resolve_constraints(variables, constraints=None):
+    state = variables[0][0].state
+    if constraints is None:
+        constraints = state.geo.arcs
+    if not propagate(state, deque(constraints)):
+        print("Domain wipe-out occurred, puzzle invalid.")
+        return False
+    return True
 
-            for cc in range(9):
-                if cc != c:
-                    Xj = variables[r][cc]
-                    constraints.append(Constraint(Xi, Xj))
 
-            for rr in range(9):
-                if rr != r:
-                    Xj = variables[rr][c]
-                    constraints.append(Constraint(Xi, Xj))
+TIE_BREAKS = ("index", "degree", "wdeg")
 
-            sr = (r // 3) * 3
-            sc = (c // 3) * 3
-            for rr in range(sr, sr + 3):
-                for cc in range(sc, sc + 3):
-                    if rr != r or cc != c:
-                        Xj = variables[rr][cc]
-                        constraints.append(Constraint(Xi, Xj))
-    return variables, constraints
 
+class SearchOrder:
+    # variable and value ordering for the search. Variables are MRV with ties broken
+    # by lowest index, "degree" (most unassigned peers) or "wdeg" (cell most often
+    # caught in a failure so far, as in dom/wdeg); lcv tries the values that appear
+    # in the fewest open peer domains first.
+    def __init__(self, tie_break="wdeg", lcv=True):
+        if tie_break not in TIE_BREAKS:
+            raise ValueError(f"unknown tie break {tie_break!r}, expected one of {list(TIE_BREAKS)}")
+        self.tie_break = tie_break
+        self.lcv = lcv
 
-def resolve_constraints(constraints):
-    queue = deque(constraints)
+    def start(self, state, weights=None):
+        return DomainBuckets(state, self.tie_break, self.lcv, weights)
 
-    while queue:
-        con = queue.popleft()
 
-        if con.resolve():  
-            
-            if not con.xi.domain:
-                print("Domain wipe-out occurred, puzzle invalid.")
-                return False
+class DomainBuckets:
+    # unassigned cells of one search filed by domain size. Domains only change through
+    # the trail, so sync() and undo() re-file just the cells logged since a mark and
+    # select() never rescans the board.
+    def __init__(self, state, tie_break="wdeg", lcv=True, weights=None):
+        self.state = state
+        self.tie_break = tie_break
+        self.lcv = lcv
+        self.buckets = [set() for _ in range(state.geo.size + 1)]
+        self.size_of = [-1 if val else domain.bit_count() for val, domain in zip(state.values, state.domains)]
+        cells = state.geo.cells
+        self.weights = list(weights) if weights is not None else [1] * cells
+        # wdeg order as one int per cell: heavier first, then lower index
+        self.rank = [w * cells + cells - 1 - i for i, w in enumerate(self.weights)]
+        for i, size in enumerate(self.size_of):
+            if size >= 0:
+                self.buckets[size].add(i)
 
-            for neighbor in con.xi.neighbors:
-                if neighbor != con.xj:
-                    queue.append(Constraint(neighbor, con.xi))
+    def sync(self, mark):
+        # after a successful propagation: re-file every cell changed since mark
+        values = self.state.values
+        domains = self.state.domains
+        size_of = self.size_of
+        buckets = self.buckets
+        for i, _ in self.state.trail[mark:]:
+            new = -1 if values[i] else domains[i].bit_count()
+            old = size_of[i]
+            if old != new:
+                if old >= 0:
+                    buckets[old].discard(i)
+                if new >= 0:
+                    buckets[new].add(i)
+                size_of[i] = new
+
+    def undo(self, mark, cell):
+        # CSPState.undo that also unassigns cell and re-files each restored cell
+        values = self.state.values
+        domains = self.state.domains
+        trail = self.state.trail
+        size_of = self.size_of
+        buckets = self.buckets
+        values[cell] = 0
+        while len(trail) > mark:
+            i, domain = trail.pop()
+            domains[i] = domain
+            new = -1 if values[i] else domain.bit_count()
+            old = size_of[i]
+            if old != new:
+                if old >= 0:
+                    buckets[old].discard(i)
+                if new >= 0:
+                    buckets[new].add(i)
+                size_of[i] = new
+
+    def failed(self, cell):
+        # propagation after assigning cell wiped out a domain: weigh both cells
+        cells = self.state.geo.cells
+        self.weights[cell] += 1
+        self.rank[cell] += cells
+        trail = self.state.trail
+        if trail and not self.state.domains[trail[-1][0]]:
+            self.weights[trail[-1][0]] += 1
+            self.rank[trail[-1][0]] += cells
+
+    def select(self):
+        # unassigned cell with the fewest values left, -1 once every cell is assigned
+        for bucket in self.buckets:
+            if bucket:
+                if len(bucket) == 1 or self.tie_break == "index":
+                    return min(bucket)
+                if self.tie_break == "degree":
+                    values = self.state.values
+                    peers = self.state.geo.peers
+                    return min(bucket, key=lambda i: (-sum(not values[k] for k in peers[i]), i))
+                return max(bucket, key=self.rank.__getitem__)
+        return -1
+
+    def values(self, cell):
+        candidates = self.state.geo.values_of(self.state.domains[cell])
+        if not self.lcv or len(candidates) < 2:
+            return candidates
+        domains = self.state.domains
+        values = self.state.values
+        open_domains = [domains[k] for k in self.state.geo.peers[cell] if not values[k]]
+        return sorted(candidates, key=lambda v: sum(d >> (v - 1) & 1 for d in open_domains))
+
+
+def _solutions(state, propagator=None, rng=None, stats=None, order=None):
+    # yields once per solution while state holds it. order (a SearchOrder) picks
+    # cells and value order; rng instead shuffles the values at every level.
+    # stats (a SolveStats) is filled in when given, its seconds leaving out the
+    # time the caller holds each solution.
+    solutions = SearchEngine(state, propagator, order, rng, stats).solutions()
+    if stats is None:
+        return solutions
+    return _timed(solutions, stats)
+
+
+def _timed(solutions, stats):
+    start = time.perf_counter()
+    for _ in solutions:
+        stats.seconds += time.perf_counter() - start
+        yield
+        start = time.perf_counter()
+    stats.seconds += time.perf_counter() - start
+
+
+# SearchEngine.run() outcomes
+SOLUTION = "solution"
+EXHAUSTED = "exhausted"
+PAUSED = "paused"
+
+# checkpoint layout: header, then values, domains, weights and the trail as little
+# endian arrays, one FRAME record (plus its remaining values) per stack level and
+# the SolveStats counters when the engine keeps them
+CHECKPOINT_MAGIC = b"CSPE"
+CHECKPOINT_HEADER = struct.Struct("<4sBBBBII")
+CHECKPOINT_FRAME = struct.Struct("<HIB")
+CHECKPOINT_STATS = struct.Struct("<6Q2d")
+_STARTED, _FINISHED, _HAS_STATS, _LCV = 1, 2, 4, 8
+
+
+def _le_bytes(values, typecode):
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _le_array(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class SearchEngine:
+    # explicit-stack DFS over a CSPState, one (cell, values left to try, trail mark)
+    # frame per level. run() works in slices: it returns SOLUTION while the state
+    # holds a solution, EXHAUSTED once the tree is done, or PAUSED when max_nodes or
+    # max_seconds run out, and the next run() carries on from there. checkpoint()
+    # freezes the search to bytes and restore() resumes it, e.g. in another process.
+    # on_select(cell, domain, depth), on_assign(cell, val), on_backtrack(cell, val)
+    # and on_propagate (see _counted, needs stats) see the search as it goes.
+    def __init__(self, state, propagator=None, order=None, rng=None, stats=None,
+                 on_select=None, on_assign=None, on_backtrack=None, on_propagate=None):
+        self.state = state
+        self.propagator = propagator if propagator is not None else Propagator()
+        self.order = order if order is not None else SearchOrder()
+        self.rng = rng
+        self.stats = stats
+        self.on_select = on_select
+        self.on_assign = on_assign
+        self.on_backtrack = on_backtrack
+        self.on_propagate = on_propagate
+        self.buckets = None
+        self.stack = []
+        self.started = False
+        self.finished = False
+
+    @property
+    def depth(self):
+        return len(self.stack)
+
+    def solutions(self):
+        while self.run() == SOLUTION:
+            yield
+
+    def _propagate(self, cells, cell=-1):
+        if self.stats is None:
+            return self.propagator(self.state, cells)
+        return _counted(self.propagator, self.state, cells, self.stats, cell, self.on_propagate)
+
+    def _push(self, cell):
+        # opens a frame for cell; False once every cell is assigned
+        if cell < 0:
+            return False
+        state = self.state
+        domain = state.domains[cell]
+        if _trace is not None:
+            _trace.pick(cell, domain, state.geo.size)
+        if self.on_select is not None:
+            self.on_select(cell, domain, len(self.stack))
+        if self.rng is None:
+            candidates = list(self.buckets.values(cell))
+        else:
+            candidates = list(state.geo.values_of(domain))
+            self.rng.shuffle(candidates)
+        candidates.reverse()
+        self.stack.append((cell, candidates, state.mark()))
+        return True
+
+    def run(self, max_nodes=None, max_seconds=None):
+        if self.finished:
+            return EXHAUSTED
+        state = self.state
+        if not self.started:
+            self.started = True
+            domains = state.domains
+            if not self._propagate([i for i in range(state.geo.cells) if is_singleton(domains[i])]):
+                self.finished = True
+                return EXHAUSTED
+            self.buckets = self.order.start(state)
+            if not self._push(self.buckets.select()):
+                self.finished = True
+                return SOLUTION
+
+        values = state.values
+        stack = self.stack
+        buckets = self.buckets
+        stats = self.stats
+        on_assign = self.on_assign
+        on_backtrack = self.on_backtrack
+        deadline = None if max_seconds is None else time.perf_counter() + max_seconds
+        nodes = 0
+        while stack:
+            if max_nodes is not None and nodes >= max_nodes:
+                return PAUSED
+            if deadline is not None and time.perf_counter() >= deadline:
+                return PAUSED
+            cell, candidates, mark = stack[-1]
+            buckets.undo(mark, cell)
+            if not candidates:
+                stack.pop()
+                if stack:
+                    # the parent's value is still assigned and its subtree has failed
+                    parent = stack[-1][0]
+                    if stats is not None:
+                        stats.backtracks += 1
+                    if on_backtrack is not None:
+                        on_backtrack(parent, values[parent])
+                continue
+            val = candidates.pop()
+            state.assign(cell, val)
+            nodes += 1
+            if stats is not None:
+                stats.nodes += 1
+                stats.max_depth = max(stats.max_depth, len(stack))
+            if on_assign is not None:
+                on_assign(cell, val)
+            if self._propagate((cell,), cell):
+                buckets.sync(mark)
+                if not self._push(buckets.select()):
+                    return SOLUTION
+            else:
+                # the next pass through the loop rolls the state back to mark
+                buckets.failed(cell)
+                if stats is not None:
+                    stats.backtracks += 1
+                if on_backtrack is not None:
+                    on_backtrack(cell, val)
+        self.finished = True
+        return EXHAUSTED
+
+    def checkpoint(self):
+        state = self.state
+        cells = state.geo.cells
+        flags = (self.started * _STARTED | self.finished * _FINISHED
+                 | (self.stats is not None) * _HAS_STATS | self.order.lcv * _LCV)
+        trail = state.trail
+        parts = [
+            CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, 1, state.geo.size, flags,
+                                   TIE_BREAKS.index(self.order.tie_break), len(trail), len(self.stack)),
+            bytes(state.values),
+            _le_bytes(state.domains, "I"),
+            _le_bytes(self.buckets.weights if self.buckets is not None else [1] * cells, "I"),
+            _le_bytes([i for i, _ in trail], "H"),
+            _le_bytes([domain for _, domain in trail], "I"),
+        ]
+        for cell, candidates, mark in self.stack:
+            parts.append(CHECKPOINT_FRAME.pack(cell, mark, len(candidates)))
+            parts.append(bytes(candidates))
+        if self.stats is not None:
+            stats = self.stats
+            parts.append(CHECKPOINT_STATS.pack(stats.nodes, stats.backtracks, stats.max_depth,
+                                               stats.propagation_calls, stats.revisions, stats.removals,
+                                               stats.propagation_seconds, stats.seconds))
+        return b"".join(parts)
+
+    @classmethod
+    def restore(cls, data, propagator=None, rng=None, **callbacks):
+        # engine resuming a checkpoint() exactly where it stopped; the search order
+        # and counters come from the checkpoint, the propagator must be passed again
+        magic, version, size, flags, tie_break, trail_len, frames = CHECKPOINT_HEADER.unpack_from(data)
+        if magic != CHECKPOINT_MAGIC or version != 1:
+            raise ValueError("not a search checkpoint")
+        cells = size * size
+        pos = CHECKPOINT_HEADER.size
+
+        def take(count):
+            nonlocal pos
+            pos += count
+            return data[pos - count:pos]
+
+        values = list(take(cells))
+        state = CSPState([values[r * size:r * size + size] for r in range(size)])
+        state.domains = list(_le_array("I", take(4 * cells)))
+        weights = list(_le_array("I", take(4 * cells)))
+        trail_cells = _le_array("H", take(2 * trail_len))
+        trail_domains = _le_array("I", take(4 * trail_len))
+        state.trail = list(zip(trail_cells, trail_domains))
+
+        stats = SolveStats() if flags & _HAS_STATS else None
+        order = SearchOrder(TIE_BREAKS[tie_break], bool(flags & _LCV))
+        engine = cls(state, propagator, order, rng, stats, **callbacks)
+        engine.started = bool(flags & _STARTED)
+        engine.finished = bool(flags & _FINISHED)
+        for _ in range(frames):
+            cell, mark, count = CHECKPOINT_FRAME.unpack(take(CHECKPOINT_FRAME.size))
+            engine.stack.append((cell, list(take(count)), mark))
+        if stats is not None:
+            (stats.nodes, stats.backtracks, stats.max_depth, stats.propagation_calls, stats.revisions,
+             stats.removals, stats.propagation_seconds, stats.seconds) = CHECKPOINT_STATS.unpack(
+                take(CHECKPOINT_STATS.size))
+        if engine.started and not engine.finished:
+            engine.buckets = order.start(state, weights)
+        return engine
+
+
+def _run_until(engine, deadline):
+    # engine.run() to its next solution or the end of the tree; with a deadline (a
+    # time.time() value, so it holds across processes) SolveCancelled once it passes
+    if deadline is None:
+        return engine.run()
+    left = deadline - time.time()
+    status = engine.run(max_seconds=left) if left > 0 else PAUSED
+    if status == PAUSED:
+        raise SolveCancelled()
+    return status
+
+
+def iter_solutions(board, propagator=None, order=None):
+    state = CSPState(board)
+    for _ in _solutions(state, propagator, order=order):
+        yield state.board()
+
+
+def count_solutions(board, limit=None, propagator=None, order=None, deadline=None):
+    # number of solutions of board, stopping early once `limit` are found. Value
+    # order barely matters when the whole tree is walked, so LCV is off by default.
+    # Past deadline (a time.time() value) the count raises SolveCancelled.
+    if order is None:
+        order = SearchOrder(lcv=False)
+    engine = SearchEngine(CSPState(board), propagator, order)
+    count = 0
+    while count != limit and _run_until(engine, deadline) == SOLUTION:
+        count += 1
+    return count
+
+
+# Grades by what a puzzle takes to solve: "Easy" needs nothing past singles (AC-3
+# and hidden singles), "Intermediate" some other inference rule, "Hard" search and
+# "Expert" more than EXPERT_BACKTRACKS backtracks of the default solver. The first
+# three share their names with the CLUE_COUNTS difficulties.
+GRADES = ("Easy", "Intermediate", "Hard", "Expert")
+SINGLES_RULES = ("hidden_singles",)
+EXPERT_BACKTRACKS = 100
+
+
+class PuzzleGrade:
+    # grade (None unless the puzzle has exactly one solution) and what it rests on:
+    # techniques are the inference rules that fired while propagating with every
+    # rule, easiest first; nodes/backtracks the default solver's search up to its
+    # first solution (0 when propagation alone solves the puzzle); solutions the
+    # count, stopping at 2
+    def __init__(self, grade, techniques, nodes, backtracks, solutions):
+        self.grade = grade
+        self.techniques = techniques
+        self.nodes = nodes
+        self.backtracks = backtracks
+        self.solutions = solutions
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def _propagated(board, rules):
+    # (state after propagating the givens with rules, or None on a contradiction, propagator)
+    state = CSPState(board)
+    propagator = Propagator(rules)
+    if not propagator(state, [i for i in range(state.geo.cells) if is_singleton(state.domains[i])]):
+        return None, propagator
+    return state, propagator
+
+
+def _solved_by(board, rules):
+    # propagation alone fills the board, which also proves the solution unique
+    state, _ = _propagated(board, rules)
+    return state is not None and all(is_singleton(d) for d in state.domains)
+
+
+def _search_effort(board, deadline=None):
+    # (solutions up to 2, nodes, backtracks) of the default solver, the counters
+    # taken at its first solution
+    stats = SolveStats()
+    engine = SearchEngine(CSPState(board), stats=stats)
+    if _run_until(engine, deadline) != SOLUTION:
+        return 0, stats.nodes, stats.backtracks
+    nodes, backtracks = stats.nodes, stats.backtracks
+    return (2 if _run_until(engine, deadline) == SOLUTION else 1), nodes, backtracks
+
+
+def grade_puzzle(board, deadline=None):
+    state, propagator = _propagated(board, tuple(INFERENCE_RULES))
+    techniques = [name for name, rule in INFERENCE_RULES.items() if propagator.stats[rule.__name__].fired]
+    if state is None:
+        return PuzzleGrade(None, techniques, 0, 0, 0)
+    if all(is_singleton(d) for d in state.domains):
+        beyond_singles = [name for name in techniques if name not in SINGLES_RULES]
+        return PuzzleGrade(GRADES[1] if beyond_singles else GRADES[0], techniques, 0, 0, 1)
+    solutions, nodes, backtracks = _search_effort(board, deadline)
+    if solutions != 1:
+        grade = None
+    elif backtracks > EXPERT_BACKTRACKS:
+        grade = GRADES[3]
+    else:
+        grade = GRADES[2]
+    return PuzzleGrade(grade, techniques, nodes, backtracks, solutions)
+
+
+def _within_grade(board, level, deadline=None):
+    # board has one solution and grades no harder than GRADES[level]
+    if level == 0:
+        return _solved_by(board, SINGLES_RULES)
+    if level == 1:
+        return _solved_by(board, tuple(INFERENCE_RULES))
+    solutions, _, backtracks = _search_effort(board, deadline)
+    return solutions == 1 and (level == 3 or backtracks <= EXPERT_BACKTRACKS)
+
+
+def generate_graded(grade, seed=None, rng=None, size=9, max_tries=100, deadline=None):
+    # a unique puzzle of the requested grade: clues come off a random solution in
+    # random order while the puzzle stays within the grade. A puzzle that ends up
+    # easier than asked gets `size` of its removed clues back and is dug again,
+    # which retests only the clues left instead of starting from a full board.
+    # Past deadline (a time.time() value) generation raises SolveCancelled
+    if grade not in GRADES:
+        raise ValueError(f"unknown grade {grade!r}, expected one of {list(GRADES)}")
+    level = GRADES.index(grade)
+    if rng is None:
+        rng = random if seed is None else random.Random(seed)
+    solution = _random_solution(size, rng, deadline)
+    board = [row[:] for row in solution]
+    cells = list(range(size * size))
+    for _ in range(max_tries):
+        rng.shuffle(cells)
+        for i in cells:
+            r, c = divmod(i, size)
+            val = board[r][c]
+            if not val:
+                continue
+            board[r][c] = 0
+            if deadline is not None and time.time() >= deadline:
+                raise SolveCancelled()
+            if not _within_grade(board, level, deadline):
+                board[r][c] = val
+        if grade_puzzle(board, deadline).grade == grade:
+            return board
+        removed = [i for i in cells if not board[i // size][i % size]]
+        for i in rng.sample(removed, min(size, len(removed))):
+            board[i // size][i % size] = solution[i // size][i % size]
+    raise RuntimeError(f"no {grade} puzzle found in {max_tries} tries")
+
+
+class SolveCancelled(Exception):
+    pass
+
+
+def solve_sudoku(variables, constraints, record_history=False, progress=None, cancel=None,
+                 progress_every=256, propagator=None, on_select=None, on_propagate=None, order=None,
+                 on_step=None):
+    # returns (solution or None, step count, board_history, SolveStats).
+    # on_step(text) streams every step as an "Assign X01 = 5" / "Backtrack X01 from 5"
+    # line (e.g. StepSink.step); without it no step text is built at all.
+    # board_history is a BoardHistory of every assignment/backtrack when
+    # record_history is set (the GUI's Previous/Next), otherwise None.
+    # progress(nodes, depth, elapsed, board) is called every progress_every nodes;
+    # once cancel.is_set() (e.g. a threading.Event) the search raises SolveCancelled.
+    # propagator (default plain AC-3) runs after every assignment and order (default
+    # SearchOrder()) picks the variables and value order; the search is a SearchEngine.
+    # on_select(cell, domain, depth) sees every branching variable and
+    # on_propagate(cell, ok, revisions, seconds) every propagation run.
+    start = time.perf_counter()
+    stats = SolveStats()
+    steps = 0
+    state = variables[0][0].state
+    cells = [var for row in variables for var in row]
+    board_history = BoardHistory(state.board()) if record_history else None
+
+    def assigned(cell, val):
+        nonlocal steps
+        steps += 1
+        if on_step is not None:
+            var = cells[cell]
+            on_step(f"Assign X{var.row}{var.col} = {val}")
+        if board_history is not None:
+            board_history.record(cell, 0, val)
+
+    def backtracked(cell, val):
+        nonlocal steps
+        steps += 1
+        if on_step is not None:
+            var = cells[cell]
+            on_step(f"Backtrack X{var.row}{var.col} from {val}")
+        if board_history is not None:
+            board_history.record(cell, val, 0)
+
+    engine = SearchEngine(state, propagator, order, stats=stats, on_select=on_select, on_assign=assigned,
+                          on_backtrack=backtracked, on_propagate=on_propagate)
+    status = EXHAUSTED
+    if _counted(propagate, state, deque(constraints), stats, on_propagate=on_propagate):
+        # the search runs in slices of progress_every nodes so it can report and be cancelled
+        budget = progress_every if progress is not None or cancel is not None else None
+        status = PAUSED
+        while status == PAUSED:
+            if cancel is not None and cancel.is_set():
+                raise SolveCancelled()
+            status = engine.run(budget)
+            if status == PAUSED and progress is not None:
+                progress(stats.nodes, engine.depth, time.perf_counter() - start, state.board())
+    stats.seconds = time.perf_counter() - start
+    if status == SOLUTION:
+        solved_board = state.board()
+        return solved_board, steps, board_history, stats
+    else:
+        return None, steps, board_history, stats
+
+
+def parse_puzzle(line):
+    # standard one-line form: 81 characters for 9x9 (256/625 for 16x16/25x25), givens
+    # written with SYMBOLS (1-9, then A-P), '0' or '.' for empty cells
+    size = isqrt(len(line))
+    if size not in (4, 9, 16, 25) or size * size != len(line):
+        raise ValueError(f"expected 81 cells (or 16, 256, 625), got {len(line)}: {line!r}")
+    symbols = SYMBOLS[:size]
+    board = create_empty_board(size)
+    for i, ch in enumerate(line.upper()):
+        val = symbols.find(ch) + 1
+        if val:
+            board[i // size][i % size] = val
+        elif ch not in "0.":
+            raise ValueError(f"invalid cell {ch!r} in puzzle {line!r}")
+    return board
+
+
+def format_board(board):
+    return "".join(SYMBOLS[val - 1] if val else "." for row in board for val in row)
+
+
+class InvalidPuzzle:
+    # a line read_puzzles could not parse, yielded in place of its board with
+    # keep_invalid=True so a batch can report it and carry on; where is "path:lineno"
+    def __init__(self, text, where, error):
+        self.text = text
+        self.where = where
+        self.error = error
+
+
+def read_puzzles(lines, keep_invalid=False):
+    # lazily yields one board per puzzle line; blank lines, '#' comments and
+    # anything after the first comma/whitespace-separated field are skipped.
+    # A malformed line raises ValueError naming its path:lineno, or with
+    # keep_invalid comes out as an InvalidPuzzle
+    name = getattr(lines, "name", "<input>")
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        text = line.replace(",", " ").split()[0]
+        try:
+            board = parse_puzzle(text)
+        except ValueError as e:
+            if not keep_invalid:
+                raise ValueError(f"{name}:{lineno}: {e}") from None
+            board = InvalidPuzzle(text, f"{name}:{lineno}", e)
+        yield board
+
+
+def encode_board(board):
+    # compact wire/record form: one byte per cell holding its value (0 = empty)
+    return bytes(val for row in board for val in row)
+
+
+def decode_board(data):
+    n = isqrt(len(data))
+    return [list(data[r * n:r * n + n]) for r in range(n)]
+
+
+# solve_board engines: the AC-3 search or Dancing Links exact cover, which takes
+# no propagator or order
+BACKENDS = ("csp", "dlx")
+
+
+def solve_board(board, propagator=None, order=None, backend="csp"):
+    if backend == "dlx":
+        return solve_exact_cover(board)
+    if backend != "csp":
+        raise ValueError(f"unknown backend {backend!r}, expected one of {list(BACKENDS)}")
+    variables, constraints = build_csp_problem(board)
+    solved, _, _, _ = solve_sudoku(variables, constraints, propagator=propagator, order=order)
+    return solved
+
+
+def solve_batch(puzzles, propagator=None, order=None, cache=None, backend="csp"):
+    # with a SolutionCache, puzzles symmetric to one already seen are answered from it
+    for board in puzzles:
+        start = time.perf_counter()
+        if cache is None:
+            solved = solve_board(board, propagator, order, backend)
+        else:
+            solved = cache.solve(board, solve_board, propagator, order, backend)
+        yield board, solved, time.perf_counter() - start
+
+
+_worker_cache = None
+
+
+def _init_worker(cache_args):
+    # workers never inherit a trace sink: they would interleave writes on one handle
+    global _worker_cache
+    set_trace_sink(None)
+    if cache_args is not None:
+        _worker_cache = SolutionCache(*cache_args, readonly=True)
+
+
+def _solve_chunk(chunk, cells, rules=(), tie_break="wdeg", backend="csp"):
+    # runs in a worker process: chunk is encoded puzzles of `cells` bytes back to back,
+    # unsolvable puzzles come back as an all-zero record, with the cache entries
+    # this chunk added for the parent to write
+    propagator = Propagator(rules)
+    order = SearchOrder(tie_break)
+    solutions = bytearray()
+    timings = array("d")
+    for offset in range(0, len(chunk), cells):
+        start = time.perf_counter()
+        board = decode_board(chunk[offset:offset + cells])
+        if _worker_cache is None:
+            solved = solve_board(board, propagator, order, backend)
+        else:
+            solved = _worker_cache.solve(board, solve_board, propagator, order, backend)
+        timings.append(time.perf_counter() - start)
+        solutions += encode_board(solved) if solved else bytes(cells)
+    added = []
+    if _worker_cache is not None:
+        added = _worker_cache.added
+        _worker_cache.added = []
+    return bytes(solutions), timings.tobytes(), added
+
+
+def _chunk_results(chunk, cells, future, cache=None):
+    solutions, timing_bytes, added = future.result()
+    if cache is not None:
+        for key, data in added:
+            cache.store_entry(key, data)
+    timings = array("d")
+    timings.frombytes(timing_bytes)
+    for k, offset in enumerate(range(0, len(chunk), cells)):
+        solved = solutions[offset:offset + cells]
+        yield (decode_board(chunk[offset:offset + cells]),
+               decode_board(solved) if any(solved) else None,
+               timings[k])
+
+
+def _encoded_chunks(puzzles, chunk_size):
+    # a chunk only holds boards of one size; a size change starts a new chunk
+    chunk = bytearray()
+    cells = 0
+    for board in puzzles:
+        record = encode_board(board)
+        if chunk and len(record) != cells:
+            yield bytes(chunk), cells
+            chunk = bytearray()
+        cells = len(record)
+        chunk += record
+        if len(chunk) == chunk_size * cells:
+            yield bytes(chunk), cells
+            chunk = bytearray()
+    if chunk:
+        yield bytes(chunk), cells
+
+
+def solve_batch_parallel(puzzles, workers=None, chunk_size=256, rules=(), tie_break="wdeg", cache=None,
+                         backend="csp"):
+    # same (board, solution, seconds) stream as solve_batch, in input order, with
+    # puzzles shipped to a process pool in chunks; at most a few chunks per worker
+    # are in flight so lazily read inputs stay lazy. A PuzzleCorpus hands over its
+    # records as chunks directly. Each worker keeps its own cache with the
+    # capacity of `cache`, reading (never writing) its SQLite file; what the
+    # workers solve comes back with each chunk and is written here, through `cache`
+    workers = workers or os.cpu_count() or 1
+    if hasattr(puzzles, "chunks"):
+        chunks = puzzles.chunks(chunk_size)
+    else:
+        chunks = _encoded_chunks(puzzles, chunk_size)
+    cache_args = None if cache is None else (cache.capacity, cache.path)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_args,)) as pool:
+        pending = deque()
+        for chunk, cells in chunks:
+            pending.append((chunk, cells, pool.submit(_solve_chunk, chunk, cells, tuple(rules), tie_break, backend)))
+            if len(pending) >= workers * 4:
+                yield from _chunk_results(*pending.popleft(), cache)
+        while pending:
+            yield from _chunk_results(*pending.popleft(), cache)
+
+
+def _keep_invalid(puzzles, solve):
+    # runs solve on the valid boards only and puts each InvalidPuzzle back in its
+    # place as an (InvalidPuzzle, None, 0.0) row; solve yields one result per
+    # board in input order, so each result belongs to the oldest board waiting
+    waiting = deque()
+
+    def valid():
+        for board in puzzles:
+            if isinstance(board, InvalidPuzzle):
+                waiting.append(board)
+            else:
+                waiting.append(None)
+                yield board
+
+    for result in solve(valid()):
+        while waiting[0] is not None:
+            yield waiting.popleft(), None, 0.0
+        waiting.popleft()
+        yield result
+    while waiting:
+        yield waiting.popleft(), None, 0.0
+
+
+def _report_invalid(puzzle):
+    print(f"{puzzle.where}: {puzzle.error}", file=sys.stderr)
+
+
+def write_results(results, out):
+    # -> (total, solved, invalid, summed seconds); invalid lines get an `invalid`
+    # row and a warning with their line number on stderr
+    solved_count = 0
+    invalid = 0
+    total = 0
+    total_time = 0.0
+    for board, solved, elapsed in results:
+        total += 1
+        if isinstance(board, InvalidPuzzle):
+            invalid += 1
+            _report_invalid(board)
+            out.write(f"{board.text},invalid,0.000\n")
+            continue
+        total_time += elapsed
+        if solved is not None:
+            solved_count += 1
+        out.write(f"{format_board(board)},{format_board(solved) if solved else 'unsolvable'},"
+                  f"{elapsed * 1000:.3f}\n")
+    return total, solved_count, invalid, total_time
 
-    return True
 
 def create_board(mode):
     if mode == 1:
@@ -211,5 +1463,200 @@ def create_board(mode):
         exit(-1)
 
 
+def _open_puzzles(path):
+    # -> (puzzles, handle to close or None): a binary corpus is memory-mapped,
+    # anything else is read lazily as one-line text puzzles, malformed lines
+    # coming out as InvalidPuzzle
+    if path == "-":
+        return read_puzzles(sys.stdin, keep_invalid=True), None
+    from puzzleCorpus import PuzzleCorpus, is_corpus
+    if is_corpus(path):
+        corpus = PuzzleCorpus(path)
+        return corpus, corpus
+    source = open(path)
+    return read_puzzles(source, keep_invalid=True), source
+
+
+def _solve_command(parser, args):
+    if args.trace and args.workers != 1:
+        parser.error("--trace requires --workers 1")
+    if args.backend == "numpy":
+        if args.workers != 1:
+            parser.error("--backend numpy requires --workers 1")
+        try:
+            from numpyPropagator import solve_batch_numpy
+        except ImportError as e:
+            parser.error(f"--backend numpy needs numpy installed ({e})")
+        if args.cache or args.cache_db:
+            parser.error("--cache is not supported with --backend numpy")
+    if args.trace:
+        set_trace_sink(TraceSink(args.trace, args.trace_format))
+
+    propagator = Propagator(args.rules)
+    order = SearchOrder(args.tie_break)
+    cache = None
+    if args.cache or args.cache_db:
+        cache = SolutionCache(args.cache_size, args.cache_db)
+    puzzles, source = _open_puzzles(args.puzzles)
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        if args.backend == "numpy":
+            solve = lambda boards: solve_batch_numpy(boards, args.batch_size, propagator, order)
+        elif args.workers == 1:
+            solve = lambda boards: solve_batch(boards, propagator, order, cache, args.backend)
+        else:
+            solve = lambda boards: solve_batch_parallel(boards, args.workers or None, args.chunk_size, args.rules,
+                                                        args.tie_break, cache, args.backend)
+        # a corpus only holds valid records and goes to the backends whole, so
+        # the parallel solve can take its chunks as they are
+        results = solve(puzzles) if hasattr(puzzles, "chunks") else _keep_invalid(puzzles, solve)
+        # wall-clock time of the whole run; the per-puzzle times add up to more
+        # than that once workers solve side by side
+        start = time.perf_counter()
+        total, solved, invalid, solve_time = write_results(results, out)
+        elapsed = time.perf_counter() - start
+    finally:
+        if source is not None:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        if args.trace:
+            set_trace_sink(None).close()
+        if cache is not None:
+            cache.close()
+    print(f"solved {solved}/{total} puzzles in {elapsed:.3f}s", file=sys.stderr)
+    if args.workers != 1:
+        print(f"per-puzzle solve time summed over workers: {solve_time:.3f}s", file=sys.stderr)
+    if invalid:
+        print(f"{invalid} of them invalid (see the warnings above)", file=sys.stderr)
+    if cache is not None and args.workers == 1:
+        print(f"cache: {cache.hits} hits, {cache.misses} misses", file=sys.stderr)
+    if args.workers == 1 and args.backend != "dlx":
+        print(f"propagation runs: {propagator.calls}", file=sys.stderr)
+        for name, stats in propagator.stats.items():
+            print(f"  {name}: fired {stats.fired}/{stats.calls}, removed {stats.removals}, "
+                  f"{stats.seconds:.3f}s", file=sys.stderr)
+
+
+def _generate_command(parser, args):
+    start = time.perf_counter()
+    if args.grade and args.any_solution:
+        parser.error("--grade always generates puzzles with a unique solution")
+    puzzles = generate_puzzles(args.count, args.grade or args.difficulty, not args.any_solution, args.seed,
+                               args.workers, args.size, graded=args.grade is not None)
+    if args.corpus:
+        if args.output == "-":
+            parser.error("--corpus needs an output file (-o)")
+        if args.corpus == "packed" and args.size > 9:
+            parser.error(f"{args.size}x{args.size} boards need --corpus bytes")
+        from puzzleCorpus import write_corpus
+        write_corpus(args.output, puzzles, args.size, args.corpus)
+    else:
+        out = sys.stdout if args.output == "-" else open(args.output, "w")
+        try:
+            for board in puzzles:
+                out.write(format_board(board) + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    print(f"generated {args.count} puzzles in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+
+
+def _count_command(parser, args):
+    puzzles, source = _open_puzzles(args.puzzles)
+    try:
+        for board in puzzles:
+            if isinstance(board, InvalidPuzzle):
+                _report_invalid(board)
+                print(f"{board.text},invalid")
+                continue
+            print(f"{format_board(board)},{count_solutions(board, args.limit, Propagator(args.rules))}")
+    finally:
+        if source is not None:
+            source.close()
+
+
+def _grade_command(parser, args):
+    puzzles, source = _open_puzzles(args.puzzles)
+    try:
+        for board in puzzles:
+            if isinstance(board, InvalidPuzzle):
+                _report_invalid(board)
+                print(f"{board.text},invalid,0,0,")
+                continue
+            grade = grade_puzzle(board)
+            print(f"{format_board(board)},{grade.grade or 'invalid'},{grade.nodes},{grade.backtracks},"
+                  f"{' '.join(grade.techniques)}")
+    finally:
+        if source is not None:
+            source.close()
+
+
+def _rule_list(text):
+    rules = [name for name in text.split(",") if name]
+    for name in rules:
+        if name not in INFERENCE_RULES:
+            raise argparse.ArgumentTypeError(f"unknown rule {name!r}, expected any of {','.join(INFERENCE_RULES)}")
+    return rules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m problemGenerator")
+    commands = parser.add_subparsers(dest="command", required=True)
+    solve = commands.add_parser("solve", help="solve puzzles from a file of one-line puzzles (81 characters for 9x9)")
+    solve.add_argument("puzzles", help="puzzle file (one-line text or a puzzleCorpus binary corpus), '-' for stdin")
+    solve.add_argument("-o", "--output", default="-", help="result file, '-' for stdout (default)")
+    solve.add_argument("-j", "--workers", type=int, default=1,
+                       help="worker processes, 0 for one per CPU (default 1: solve in-process)")
+    solve.add_argument("--chunk-size", type=int, default=256, help="puzzles sent to a worker at a time")
+    solve.add_argument("--trace", help="append AC-3/search events to this file (in-process solving only)")
+    solve.add_argument("--trace-format", choices=("text", "jsonl", "binary"), default="text")
+    solve.add_argument("--rules", type=_rule_list, default=[],
+                       help=f"comma-separated inference rules to run with AC-3: {','.join(INFERENCE_RULES)}")
+    solve.add_argument("--tie-break", choices=TIE_BREAKS, default="wdeg",
+                       help="break MRV ties by lowest index, most unassigned peers (degree) "
+                            "or most failures so far (wdeg, default)")
+    solve.add_argument("--backend", choices=BACKENDS + ("numpy",), default="csp",
+                       help="dlx: Dancing Links exact cover (ignores --rules/--tie-break); "
+                            "numpy: propagate whole batches as arrays, search only what is left open")
+    solve.add_argument("--batch-size", type=int, default=4096, help="boards per numpy batch")
+    solve.add_argument("--cache", action="store_true",
+                       help="answer puzzles symmetric to one already solved (rotated, relabeled, ...) from a cache; "
+                            "9x9 and smaller only, larger boards are always solved")
+    solve.add_argument("--cache-db", help="also keep cached solutions in this SQLite file across runs (implies --cache)")
+    solve.add_argument("--cache-size", type=int, default=4096, help="solutions kept in memory by --cache")
+    solve.set_defaults(run=_solve_command)
+
+    generate = commands.add_parser("generate", help="write generated puzzles as one-line puzzles")
+    generate.add_argument("-n", "--count", type=int, default=1)
+    generate.add_argument("-d", "--difficulty", choices=tuple(CLUE_COUNTS), default="Easy",
+                          help="target clue count (see --grade for the measured difficulty)")
+    generate.add_argument("-g", "--grade", choices=GRADES,
+                          help="generate unique puzzles of this measured grade instead of a clue count")
+    generate.add_argument("-s", "--size", type=int, choices=(4, 9, 16, 25), default=9, help="board size (default 9)")
+    generate.add_argument("--seed", type=int, help="seed for a reproducible run")
+    generate.add_argument("--any-solution", action="store_true",
+                          help="skip the uniqueness check (puzzles may have several solutions)")
+    generate.add_argument("-j", "--workers", type=int, default=1,
+                          help="worker processes, 0 for one per CPU (default 1: generate in-process)")
+    generate.add_argument("-o", "--output", default="-", help="puzzle file, '-' for stdout (default)")
+    generate.add_argument("--corpus", choices=("packed", "bytes"),
+                          help="write a binary corpus (see puzzleCorpus) instead of text lines")
+    generate.set_defaults(run=_generate_command)
+
+    count = commands.add_parser("count", help="count the solutions of each puzzle in a file")
+    count.add_argument("puzzles", help="puzzle file (text or binary corpus), '-' for stdin")
+    count.add_argument("--limit", type=int, help="stop counting a puzzle after this many solutions")
+    count.add_argument("--rules", type=_rule_list, default=[], help="inference rules, as for solve")
+    count.set_defaults(run=_count_command)
+
+    grade = commands.add_parser("grade", help="rate each puzzle in a file by the techniques and search it needs")
+    grade.add_argument("puzzles", help="puzzle file (text or binary corpus), '-' for stdin")
+    grade.set_defaults(run=_grade_command)
+
+    args = parser.parse_args(argv)
+    args.run(parser, args)
+
+
 if __name__ == "__main__":
-    pass
+    main()
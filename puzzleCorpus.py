@@ -0,0 +1,273 @@
+import argparse
+import mmap
+import struct
+import sys
+from math import isqrt
+
+from problemGenerator import SYMBOLS, decode_board, parse_puzzle
+
+# Binary puzzle corpus: a fixed header followed by fixed-width records, so record
+# k sits at HEADER.size + k * width and any puzzle is one slice of the mapped
+# file. "packed" records hold two cells per byte (high nibble first, 41 bytes for
+# 9x9); "bytes" records hold one cell per byte (81 bytes, the encode_board form)
+# and are the only choice for 16x16/25x25, whose values do not fit a nibble.
+CORPUS_MAGIC = b"SDKC"
+CORPUS_VERSION = 1
+HEADER = struct.Struct("<4sBBBxQ")  # magic, version, board size, encoding, record count
+PACKED = 0
+BYTES = 1
+ENCODINGS = {"packed": PACKED, "bytes": BYTES}
+
+_HIGH = bytes(b >> 4 for b in range(256))
+_LOW = bytes(b & 15 for b in range(256))
+_SHIFT = bytes((b << 4) & 255 for b in range(256))
+# text line <-> cell bytes in one bytes.translate; 255 marks characters that are
+# not cells, and those lines go through parse_puzzle for its error message
+_TO_TEXT = bytes.maketrans(bytes(range(len(SYMBOLS) + 1)), b"." + SYMBOLS.encode())
+_FROM_TEXT = bytearray([255]) * 256
+_FROM_TEXT[ord(".")] = _FROM_TEXT[ord("0")] = 0
+for _val, _ch in enumerate(SYMBOLS, 1):
+    _FROM_TEXT[ord(_ch)] = _FROM_TEXT[ord(_ch.lower())] = _val
+_FROM_TEXT = bytes(_FROM_TEXT)
+
+
+def record_width(size, encoding):
+    cells = size * size
+    return (cells + 1) // 2 if encoding == PACKED else cells
+
+
+def pack_cells(cells):
+    # cell bytes (encode_board form) -> packed record
+    if len(cells) % 2:
+        cells = bytes(cells) + b"\0"
+    high = bytes(cells[0::2]).translate(_SHIFT)
+    low = bytes(cells[1::2])
+    return (int.from_bytes(high, "big") | int.from_bytes(low, "big")).to_bytes(len(low), "big")
+
+
+def unpack_cells(data, cells):
+    # packed records back to back -> their cell bytes back to back; every record
+    # of an odd cell count carries one padding nibble, dropped here
+    out = bytearray(len(data) * 2)
+    out[0::2] = data.translate(_HIGH)
+    out[1::2] = data.translate(_LOW)
+    if cells % 2:
+        del out[cells::cells + 1]
+    return out
+
+
+class CorpusWriter:
+    # streams boards of one size into a new corpus; the record count in the
+    # header is filled in on close
+    def __init__(self, path, size=9, encoding="packed"):
+        self.encoding = ENCODINGS[encoding]
+        if self.encoding == PACKED and size > 15:
+            raise ValueError(f"{size}x{size} values do not fit packed records, use the bytes encoding")
+        self.size = size
+        self.count = 0
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, size, self.encoding, 0))
+
+    def write(self, board):
+        if len(board) != self.size:
+            raise ValueError(f"corpus holds {self.size}x{self.size} boards, got {len(board)}x{len(board)}")
+        self.write_cells(bytes(val for row in board for val in row))
+
+    def write_cells(self, cells):
+        self.file.write(pack_cells(cells) if self.encoding == PACKED else cells)
+        self.count += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.seek(0)
+        self.file.write(HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, self.size, self.encoding, self.count))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_corpus(path, boards, size=9, encoding="packed"):
+    with CorpusWriter(path, size, encoding) as writer:
+        for board in boards:
+            writer.write(board)
+    return writer.count
+
+
+def is_corpus(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(CORPUS_MAGIC)) == CORPUS_MAGIC
+    except OSError:
+        return False
+
+
+class PuzzleCorpus:
+    # read-only, memory-mapped view of a corpus file: len(), corpus[k] as a board,
+    # record(k) as a zero-copy memoryview of the stored record, and iteration or
+    # chunks() in file order
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = None
+        self.view = None
+        try:
+            self._open(path)
+        except (ValueError, OSError):
+            self.close()
+            raise
+
+    def _open(self, path):
+        if self.file.seek(0, 2) < HEADER.size:
+            raise ValueError(f"{path} is not a puzzle corpus")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size, encoding, count = HEADER.unpack_from(self.map)
+        if magic != CORPUS_MAGIC or version != CORPUS_VERSION or encoding not in (PACKED, BYTES):
+            raise ValueError(f"{path} is not a puzzle corpus")
+        self.size = size
+        self.cells = size * size
+        self.encoding = encoding
+        self.width = record_width(size, encoding)
+        self.count = count
+        if HEADER.size + count * self.width > len(self.map):
+            raise ValueError(f"{path} is truncated: header promises {count} records")
+        self.view = memoryview(self.map)[HEADER.size:HEADER.size + count * self.width]
+
+    def __len__(self):
+        return self.count
+
+    def record(self, k):
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError("corpus index out of range")
+        return self.view[k * self.width:(k + 1) * self.width]
+
+    def cell_bytes(self, start=0, stop=None):
+        # cells of records start..stop back to back, in the encode_board form
+        stop = self.count if stop is None else min(stop, self.count)
+        data = self.view[start * self.width:stop * self.width]
+        if self.encoding == BYTES:
+            return bytes(data)
+        return bytes(unpack_cells(bytes(data), self.cells))
+
+    def __getitem__(self, k):
+        record = self.record(k)
+        if self.encoding == PACKED:
+            return decode_board(unpack_cells(bytes(record), self.cells))
+        return decode_board(record)
+
+    def chunks(self, chunk_size):
+        # (cell bytes, cells per board) chunks as solve_batch_parallel ships them to workers
+        for start in range(0, self.count, chunk_size):
+            yield self.cell_bytes(start, start + chunk_size), self.cells
+
+    def __iter__(self):
+        cells = self.cells
+        for chunk, _ in self.chunks(4096):
+            for offset in range(0, len(chunk), cells):
+                yield decode_board(chunk[offset:offset + cells])
+
+    def close(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def text_cells(line):
+    # one puzzle line (the first comma/whitespace field, as read_puzzles takes it)
+    # -> cell bytes, or None for blank and '#' comment lines
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    line = line.replace(",", " ").split()[0]
+    cells = line.encode("ascii", "replace").translate(_FROM_TEXT)
+    size = isqrt(len(line))
+    if size not in (4, 9, 16, 25) or size * size != len(line) or max(cells) > size:
+        parse_puzzle(line)
+        raise ValueError(f"invalid cell in puzzle {line!r}")
+    return cells
+
+
+def text_to_corpus(lines, path, encoding="packed"):
+    # one-line text puzzles -> corpus; the board size is taken from the first puzzle
+    writer = None
+    try:
+        for line in lines:
+            cells = text_cells(line)
+            if cells is None:
+                continue
+            if writer is None:
+                writer = CorpusWriter(path, isqrt(len(cells)), encoding)
+            elif len(cells) != writer.size * writer.size:
+                raise ValueError(f"corpus holds {writer.size}x{writer.size} boards, got {line.strip()!r}")
+            writer.write_cells(cells)
+        if writer is None:
+            writer = CorpusWriter(path, 9, encoding)
+    finally:
+        if writer is not None:
+            writer.close()
+    return writer.count
+
+
+def corpus_to_text(path, out):
+    with PuzzleCorpus(path) as corpus:
+        cells = corpus.cells
+        for chunk, _ in corpus.chunks(4096):
+            text = chunk.translate(_TO_TEXT).decode("ascii")
+            out.write("".join(text[offset:offset + cells] + "\n" for offset in range(0, len(text), cells)))
+        return len(corpus)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m puzzleCorpus")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack = commands.add_parser("pack", help="convert one-line text puzzles to a binary corpus")
+    pack.add_argument("puzzles", help="text puzzle file, '-' for stdin")
+    pack.add_argument("corpus", help="corpus file to write")
+    pack.add_argument("--encoding", choices=tuple(ENCODINGS), default="packed",
+                      help="packed: two cells per byte (default, up to 9x9); bytes: one cell per byte")
+    unpack = commands.add_parser("unpack", help="convert a binary corpus back to one-line text puzzles")
+    unpack.add_argument("corpus")
+    unpack.add_argument("-o", "--output", default="-", help="text puzzle file, '-' for stdout (default)")
+    info = commands.add_parser("info", help="print a corpus header")
+    info.add_argument("corpus")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        source = sys.stdin if args.puzzles == "-" else open(args.puzzles)
+        try:
+            count = text_to_corpus(source, args.corpus, args.encoding)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        print(f"packed {count} puzzles into {args.corpus}", file=sys.stderr)
+    elif args.command == "unpack":
+        out = sys.stdout if args.output == "-" else open(args.output, "w")
+        try:
+            count = corpus_to_text(args.corpus, out)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"unpacked {count} puzzles", file=sys.stderr)
+    else:
+        with PuzzleCorpus(args.corpus) as corpus:
+            encoding = "packed" if corpus.encoding == PACKED else "bytes"
+            print(f"{corpus.count} puzzles, {corpus.size}x{corpus.size}, {encoding} records of {corpus.width} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import sqlite3
+from collections import OrderedDict
+from itertools import permutations
+from math import isqrt
+
+# Puzzles that differ only by a transpose, band/stack or row/column-within-band
+# permutations (which covers rotations and reflections) or a relabeling of the
+# digits have the same solution up to that symmetry. canonical_form picks one
+# representative per class, the lexicographically smallest board (empty cells
+# as 0) over the whole group, so the cache below solves each class once.
+
+# tied partial layouts kept per row during canonicalization; only pathological
+# boards get near it, and past it the form is still a valid (just not minimal)
+# representative, which costs hit rate but never correctness
+MAX_TIED = 4096
+
+# largest board the cache canonicalizes: on 16x16 a canonical_form costs seconds
+# against tens of milliseconds for solving, so bigger boards bypass the cache
+MAX_CACHED_SIZE = 9
+
+
+class CanonicalForm:
+    # one symmetry mapping a board onto its class representative: output cell
+    # (i, j) is source cell (rows[i], cols[j]) of the board (transposed first if
+    # `transposed`), with value v written as labels[v]
+    def __init__(self, size, transposed, rows, cols, labels):
+        self.size = size
+        self.transposed = transposed
+        self.rows = rows
+        self.cols = cols
+        self.labels = labels
+        self.unlabels = [0] * len(labels)
+        for val, label in enumerate(labels):
+            self.unlabels[label] = val
+        self.key = b""
+
+    def to_canonical(self, board):
+        grid = _oriented(board, self.transposed)
+        labels = self.labels
+        return [[labels[grid[r][c]] for c in self.cols] for r in self.rows]
+
+    def from_canonical(self, board):
+        n = self.size
+        grid = [[0] * n for _ in range(n)]
+        unlabels = self.unlabels
+        for i, r in enumerate(self.rows):
+            row = board[i]
+            for j, c in enumerate(self.cols):
+                grid[r][c] = unlabels[row[j]]
+        return _oriented(grid, self.transposed)
+
+
+def _oriented(board, transposed):
+    return [list(col) for col in zip(*board)] if transposed else board
+
+
+def _cell_options(columns, labels, nxt):
+    # lays out one cell of a stack's column partition for this row: empty columns
+    # first (they stay one tied cell), then already labeled digits by label, then
+    # new digits, which get the next labels in every possible order
+    if len(columns) == 1:
+        p, v = columns[0]
+        if not v or labels[v]:
+            yield (labels[v],), labels, nxt, ((p,),)
+        else:
+            lab = list(labels)
+            lab[v] = nxt
+            yield (nxt,), tuple(lab), nxt + 1, ((p,),)
+        return
+    zeros = tuple(p for p, v in columns if not v)
+    known = sorted((labels[v], p) for p, v in columns if v and labels[v])
+    new = [(p, v) for p, v in columns if v and not labels[v]]
+    block = (0,) * len(zeros) + tuple(label for label, _ in known) + tuple(range(nxt, nxt + len(new)))
+    cells = ((zeros,) if zeros else ()) + tuple((p,) for _, p in known)
+    if len(new) > 1:
+        orders = permutations(new)
+    else:
+        orders = (new,)
+    for ordered in orders:
+        lab = list(labels)
+        for k, (_, v) in enumerate(ordered):
+            lab[v] = nxt + k
+        yield block, tuple(lab), nxt + len(new), cells + tuple((p,) for p, _ in ordered)
+
+
+def _stack_options(vals, stack, box, cells, labels, nxt):
+    # every minimal layout of one stack: (block, labels, next label, new cells)
+    options = [((), labels, nxt, ())]
+    base = stack * box
+    for cell in cells:
+        columns = [(p, vals[base + p]) for p in cell]
+        step = []
+        for block, lab, nl, done in options:
+            for extra, lab2, nl2, new_cells in _cell_options(columns, lab, nl):
+                step.append((block + extra, lab2, nl2, done + new_cells))
+        options = step
+    return options
+
+
+def _group_options(vals, box, stacks, cells, labels, nxt):
+    # lays out a group of stacks for this row, yielding (block, labels, next label,
+    # groups). A group of several stacks is all empty in earlier rows, so any order
+    # of them looked the same so far; stacks empty in this row too stay tied and
+    # go first, the rest are placed smallest block first, branching on ties
+    if len(stacks) == 1:
+        for block, lab, nl, new_cells in _stack_options(vals, stacks[0], box, cells, labels, nxt):
+            yield block, lab, nl, ((stacks, new_cells),)
+        return
+    empty = tuple(s for s in stacks if not any(vals[s * box:s * box + box]))
+    rest = tuple(s for s in stacks if s not in empty)
+    head = (((empty, cells),) if empty else ())
+    options = [((0,) * (box * len(empty)), labels, nxt, head, rest)]
+    for _ in rest:
+        step = []
+        for block, lab, nl, groups, left in options:
+            for s in left:
+                for extra, lab2, nl2, new_cells in _stack_options(vals, s, box, cells, lab, nl):
+                    step.append((block + extra, lab2, nl2, groups + (((s,), new_cells),),
+                                 tuple(x for x in left if x != s)))
+        best = min(option[0] for option in step)
+        options = [option for option in step if option[0] == best]
+    for block, lab, nl, groups, _ in options:
+        yield block, lab, nl, groups
+
+
+def _row_options(vals, box, labels, nxt, groups, bound=None):
+    # minimal layouts of one source row under the column structure built so far;
+    # empty as soon as the row is known to come out above `bound`
+    options = [((), labels, nxt, ())]
+    for stacks, cells in groups:
+        step = []
+        for out, lab, nl, done in options:
+            for block, lab2, nl2, new_groups in _group_options(vals, box, stacks, cells, lab, nl):
+                step.append((out + block, lab2, nl2, done + new_groups))
+        best = min(option[0] for option in step)
+        if bound is not None and best > bound[:len(best)]:
+            return []
+        options = [option for option in step if option[0] == best]
+    return options
+
+
+def _candidate_rows(grid, box, used, band):
+    # rows that may come next: the rest of the current band, or any row of an
+    # unused band when a band is complete. Empty rows of one band (and wholly
+    # empty bands) are interchangeable, so only the first of them is tried
+    if band is None:
+        bands = [b for b in range(len(grid) // box) if b * box not in used]
+        empty_bands = [b for b in bands if not any(any(grid[r]) for r in range(b * box, b * box + box))]
+        bands = [b for b in bands if b not in empty_bands[1:]]
+    else:
+        bands = [band]
+    rows = []
+    for b in bands:
+        seen_empty = False
+        for r in range(b * box, b * box + box):
+            if r in used:
+                continue
+            if not any(grid[r]):
+                if seen_empty:
+                    continue
+                seen_empty = True
+            rows.append(r)
+    return rows
+
+
+def _repeats_a_given(grid, box):
+    n = len(grid)
+    units = [list(row) for row in grid] + [list(col) for col in zip(*grid)]
+    units += [[grid[r][c] for r in range(br, br + box) for c in range(bc, bc + box)]
+              for br in range(0, n, box) for bc in range(0, n, box)]
+    for unit in units:
+        givens = [val for val in unit if val]
+        if len(givens) != len(set(givens)):
+            return True
+    return False
+
+
+def canonical_form(board):
+    # smallest board, row by row, over the symmetry group: every surviving partial
+    # layout has produced the same rows so far; each row extends them with every
+    # candidate source row and keeps only the layouts giving the smallest next row.
+    # The labeling relies on a row never repeating a value, so boards with
+    # conflicting givens (unsolvable anyway) are refused
+    n = len(board)
+    box = isqrt(n)
+    if _repeats_a_given(board, box):
+        raise ValueError("board repeats a given within a row, column or box")
+    grids = (board, _oriented(board, True))
+    start = ((tuple(range(n // box)), (tuple(range(box)),)),)
+    states = [(t, (), None, (0,) * (n + 1), 1, start) for t in (0, 1)]
+    for i in range(n):
+        best = None
+        found = {}
+        for t, rows, band, labels, nxt, groups in states:
+            grid = grids[t]
+            used = set(rows)
+            for r in _candidate_rows(grid, box, used, band):
+                for out, lab, nl, new_groups in _row_options(grid[r], box, labels, nxt, groups, best):
+                    if best is None or out < best:
+                        best = out
+                        found = {}
+                    if out == best:
+                        next_band = None if (i + 1) % box == 0 else r // box
+                        key = (t, frozenset(used | {r}), next_band, lab, new_groups)
+                        if key not in found and len(found) < MAX_TIED:
+                            found[key] = (t, rows + (r,), next_band, lab, nl, new_groups)
+        states = list(found.values())
+
+    t, rows, _, labels, nxt, groups = states[0]
+    cols = []
+    for stacks, cells in groups:
+        for s in stacks:
+            for cell in cells:
+                cols.extend(s * box + p for p in cell)
+    # digits absent from the board take the remaining labels in order
+    labels = list(labels)
+    for val in range(1, n + 1):
+        if not labels[val]:
+            labels[val] = nxt
+            nxt += 1
+    form = CanonicalForm(n, bool(t), rows, tuple(cols), tuple(labels))
+    form.key = bytes(val for row in form.to_canonical(board) for val in row)
+    return form
+
+
+def _decode(data, n):
+    return [list(data[r * n:r * n + n]) for r in range(n)]
+
+
+class SolutionCache:
+    # solutions by canonical form: an in-memory LRU of `capacity` entries in
+    # front of an optional SQLite file. Entries are canonical solutions (b"" for
+    # an unsolvable puzzle) and are mapped back to each caller's orientation.
+    # A readonly cache (a pool worker's) only reads the file, which must exist;
+    # its new entries collect in `added` for the one writing cache to store_entry()
+    def __init__(self, capacity=4096, path=None, commit_every=256, readonly=False):
+        self.capacity = capacity
+        self.path = path
+        self.readonly = readonly
+        self.entries = OrderedDict()
+        self.added = []
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        self.commit_every = commit_every
+        self._pending = 0
+        if path is not None and readonly:
+            self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        elif path is not None:
+            self.db = sqlite3.connect(path)
+            # WAL lets readonly workers read while this connection writes
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions (puzzle BLOB PRIMARY KEY, solution BLOB NOT NULL)")
+            self.db.commit()
+
+    def _get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.db is not None:
+            row = self.db.execute("SELECT solution FROM solutions WHERE puzzle = ?", (key,)).fetchone()
+            if row is not None:
+                self._remember(key, row[0])
+                return row[0]
+        return None
+
+    def _remember(self, key, solution):
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def lookup(self, board):
+        # -> (form, hit, solution); solution is in the board's own orientation,
+        # None for a cached unsolvable puzzle or on a miss. Boards with conflicting
+        # givens or over MAX_CACHED_SIZE bypass the cache: form is None and store()
+        # ignores them
+        form = None
+        if len(board) <= MAX_CACHED_SIZE:
+            try:
+                form = canonical_form(board)
+            except ValueError:
+                pass
+        if form is None:
+            self.misses += 1
+            return None, False, None
+        solution = self._get(form.key)
+        if solution is None:
+            self.misses += 1
+            return form, False, None
+        self.hits += 1
+        if not solution:
+            return form, True, None
+        return form, True, form.from_canonical(_decode(solution, form.size))
+
+    def store(self, form, solution):
+        if form is None:
+            return
+        data = b"" if solution is None else bytes(val for row in form.to_canonical(solution) for val in row)
+        self.store_entry(form.key, data)
+
+    def store_entry(self, key, data):
+        # key and data in canonical form, as store() and `added` hold them
+        self._remember(key, data)
+        if self.readonly:
+            self.added.append((key, data))
+        elif self.db is not None:
+            self.db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?)", (key, data))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self.flush()
+
+    def solve(self, board, solver, *args):
+        # solver(board, *args) -> solution or None, only called on a miss
+        form, hit, solution = self.lookup(board)
+        if not hit:
+            solution = solver(board, *args)
+            self.store(form, solution)
+        return solution
+
+    def flush(self):
+        if self.db is not None and not self.readonly and self._pending:
+            self.db.commit()
+            self._pending = 0
+
+    def close(self):
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
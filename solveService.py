@@ -0,0 +1,390 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from dancingLinks import solve_exact_cover
+from problemGenerator import (BACKENDS, CLUE_COUNTS, GRADES, PAUSED, SOLUTION, CSPState, Propagator, SearchEngine,
+                              SearchOrder, SolveCancelled, count_solutions, format_board, generate_puzzles,
+                              parse_puzzle)
+
+# Local HTTP/JSON front end to the solver. The event loop only parses requests and
+# answers them; solving, counting and generating run in a process pool. Each job
+# gets a deadline: every CSP search (solve with backend "csp", count, and the
+# searches inside generation) stops itself through SearchEngine.run(max_seconds=...),
+# and a DLX solve, which cannot pause, is abandoned by the event loop after
+# TIMEOUT_GRACE (its worker finishes the puzzle in the background). Past
+# max_pending jobs in flight new work is refused with 503 rather than queued.
+DEFAULT_PORT = 8765
+TIMEOUT_GRACE = 1.0
+LATENCY_WINDOW = 1024
+RATE_WINDOW = 60.0
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+def _remaining(deadline):
+    # seconds left before a job's wall-clock deadline; deadlines are time.time()
+    # values because they cross process boundaries
+    left = deadline - time.time()
+    if left <= 0:
+        raise JobTimeout()
+    return left
+
+
+def _solve_job(puzzles, backend, rules, tie_break, deadline):
+    # one-line puzzles -> one-line solutions, None for an unsolvable puzzle
+    propagator = Propagator(rules)
+    solutions = []
+    for line in puzzles:
+        board = parse_puzzle(line)
+        if backend == "dlx":
+            _remaining(deadline)
+            solved = solve_exact_cover(board)
+        else:
+            engine = SearchEngine(CSPState(board), propagator, SearchOrder(tie_break))
+            status = engine.run(max_seconds=_remaining(deadline))
+            if status == PAUSED:
+                raise JobTimeout()
+            solved = engine.state.board() if status == SOLUTION else None
+        solutions.append(None if solved is None else format_board(solved))
+    return solutions
+
+
+def _count_job(line, limit, deadline):
+    try:
+        return count_solutions(parse_puzzle(line), limit, deadline=deadline)
+    except SolveCancelled:
+        raise JobTimeout() from None
+
+
+def _generate_job(count, difficulty, unique, seed, size, graded, deadline):
+    try:
+        return [format_board(board)
+                for board in generate_puzzles(count, difficulty, unique, seed, 1, size, graded, deadline)]
+    except SolveCancelled:
+        raise JobTimeout() from None
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.items = 0
+        self.statuses = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+        summary = {"requests": self.requests, "items": self.items,
+                   "statuses": {str(code): n for code, n in sorted(self.statuses.items())}}
+        if latencies:
+            def pick(q):
+                return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3)
+            summary["latency_ms"] = {"mean": round(sum(latencies) / len(latencies) * 1000, 3),
+                                     "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99),
+                                     "max": round(latencies[-1] * 1000, 3)}
+        return summary
+
+
+class ServiceMetrics:
+    # per-endpoint request/status counts and a window of the last LATENCY_WINDOW
+    # latencies, plus completion times over the last RATE_WINDOW seconds for
+    # throughput; items counts puzzles solved, counted or generated
+    def __init__(self):
+        self.started = time.monotonic()
+        self.endpoints = {}
+        self.recent = deque()
+
+    def record(self, endpoint, status, seconds, items=0):
+        metrics = self.endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self.endpoints[endpoint] = EndpointMetrics()
+        metrics.requests += 1
+        metrics.items += items
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+        metrics.latencies.append(seconds)
+        now = time.monotonic()
+        self.recent.append((now, items))
+        self._expire(now)
+
+    def _expire(self, now):
+        while self.recent and self.recent[0][0] < now - RATE_WINDOW:
+            self.recent.popleft()
+
+    def snapshot(self, in_flight, max_pending, workers):
+        now = time.monotonic()
+        self._expire(now)
+        window = min(RATE_WINDOW, now - self.started) or 1e-9
+        return {"uptime_seconds": round(now - self.started, 3), "workers": workers,
+                "in_flight": in_flight, "max_pending": max_pending,
+                "requests_per_second": round(len(self.recent) / window, 3),
+                "items_per_second": round(sum(items for _, items in self.recent) / window, 3),
+                "endpoints": {name: m.as_dict() for name, m in sorted(self.endpoints.items())}}
+
+
+def _checked_puzzle(line, name="puzzle"):
+    if not isinstance(line, str):
+        raise BadRequest(f"{name!r} must be a one-line puzzle string")
+    parse_puzzle(line)
+    return line
+
+
+def _int_field(request, name, default, low, high):
+    value = request.get(name, default)
+    if value is None and default is None:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+        raise BadRequest(f"{name!r} must be an integer from {low} to {high}")
+    return value
+
+
+class SolveService:
+    # routes: POST /solve, /count, /generate with a JSON object body, GET /metrics
+    # and /health. Every job request may carry "timeout" (seconds, capped at
+    # max_timeout); answers are JSON objects, errors {"error": message}
+    def __init__(self, workers=None, max_pending=None, timeout=10.0, max_timeout=60.0, max_batch=1000,
+                 max_body=1 << 20):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.workers
+        self.timeout = timeout
+        self.max_timeout = max_timeout
+        self.max_batch = max_batch
+        self.max_body = max_body
+        # forked workers would inherit the listening socket and keep the port open
+        # after the server dies; forkserver children start from a clean process
+        context = None
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        self.pending = 0
+        self.metrics = ServiceMetrics()
+        self.loop = None
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.handle, host, port)
+        try:
+            # SIGTERM stops serving like Ctrl-C, so close() still shuts the pool down
+            self.loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except (NotImplementedError, AttributeError):
+            pass
+        async with server:
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def handle(self, reader, writer):
+        # one connection, HTTP/1.1 keep-alive until the client closes or asks to
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, 431, {"error": "request head too large"}, False)
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, version = lines[0].split(" ")
+                    headers = {}
+                    for line in lines[1:]:
+                        if line:
+                            name, value = line.split(":", 1)
+                            headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get("content-length", "0"))
+                    if length < 0:
+                        raise ValueError("negative Content-Length")
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "malformed request"}, False)
+                    break
+                if length > self.max_body:
+                    await self.respond(writer, 413, {"error": f"body over {self.max_body} bytes"}, False)
+                    break
+                body = await reader.readexactly(length)
+                status, payload = await self.dispatch(method, path.split("?", 1)[0], body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        head = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}", "Connection: " + ("keep-alive" if keep_alive else "close")]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method, path, body):
+        routes = {"/solve": self.solve, "/count": self.count, "/generate": self.generate}
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, self.metrics.snapshot(self.pending, self.max_pending, self.workers)
+        if path not in routes:
+            return 404, {"error": f"no such endpoint {path}"}
+        if method != "POST":
+            return 405, {"error": f"{path} takes POST"}
+
+        start = time.perf_counter()
+        items = 0
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise BadRequest("body must be a JSON object")
+            payload, items = await routes[path](request)
+            status = 200
+        except (BadRequest, ValueError) as e:
+            status, payload = 400, {"error": str(e)}
+        except JobTimeout:
+            status, payload = 504, {"error": "time limit exceeded"}
+        except ServiceBusy:
+            status, payload = 503, {"error": f"{self.max_pending} jobs already in flight, retry later"}
+        except Exception as e:
+            # e.g. generate_graded giving up on a grade; the service keeps running
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+        seconds = time.perf_counter() - start
+        if status == 200:
+            payload["seconds"] = round(seconds, 6)
+        self.metrics.record(path[1:], status, seconds, items)
+        return status, payload
+
+    def _timeout(self, request):
+        timeout = request.get("timeout", self.timeout)
+        if not isinstance(timeout, (int, float)) or isinstance(timeout, bool) or timeout <= 0:
+            raise BadRequest("'timeout' must be a positive number of seconds")
+        return min(timeout, self.max_timeout)
+
+    async def run_job(self, request, fn, *args):
+        # hands fn(*args, deadline) to the pool. A job counts as in flight until its
+        # worker is done with it, so abandoned DLX solves still hold back new work
+        if self.pending >= self.max_pending:
+            raise ServiceBusy()
+        timeout = self._timeout(request)
+        self.pending += 1
+        future = self.pool.submit(fn, *args, time.time() + timeout)
+        future.add_done_callback(self._job_finished)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout + TIMEOUT_GRACE)
+        except asyncio.TimeoutError:
+            raise JobTimeout() from None
+
+    def _job_finished(self, future):
+        # called on the pool's thread
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._release)
+
+    def _release(self):
+        self.pending -= 1
+
+    async def solve(self, request):
+        # {"puzzle": "..."} or {"puzzles": [...]}, optional backend, rules, tie_break
+        if "puzzles" in request:
+            puzzles = request["puzzles"]
+            if not isinstance(puzzles, list) or not 1 <= len(puzzles) <= self.max_batch:
+                raise BadRequest(f"'puzzles' must be a list of 1 to {self.max_batch} puzzle strings")
+            for line in puzzles:
+                _checked_puzzle(line, "puzzles")
+        else:
+            puzzles = [_checked_puzzle(request.get("puzzle"))]
+        backend = request.get("backend", "csp")
+        if backend not in BACKENDS:
+            raise BadRequest(f"unknown backend {backend!r}, expected one of {list(BACKENDS)}")
+        rules = request.get("rules", [])
+        if not isinstance(rules, list) or not all(isinstance(rule, str) for rule in rules):
+            raise BadRequest("'rules' must be a list of inference rule names")
+        tie_break = request.get("tie_break", "wdeg")
+        Propagator(rules)
+        SearchOrder(tie_break)
+        solutions = await self.run_job(request, _solve_job, puzzles, backend, rules, tie_break)
+        if "puzzles" in request:
+            return {"solutions": solutions}, len(solutions)
+        return {"solution": solutions[0]}, 1
+
+    async def count(self, request):
+        # {"puzzle": "...", "limit": n}; without a limit every solution is counted
+        line = _checked_puzzle(request.get("puzzle"))
+        limit = _int_field(request, "limit", None, 1, 1 << 62)
+        count = await self.run_job(request, _count_job, line, limit)
+        return {"count": count, "limit": limit}, 1
+
+    async def generate(self, request):
+        # {"count": n, "difficulty": CLUE_COUNTS name} or {"grade": GRADES name}, and
+        # optional unique (default true), seed and size
+        count = _int_field(request, "count", 1, 1, self.max_batch)
+        size = _int_field(request, "size", 9, 4, 25)
+        if size not in (4, 9, 16, 25):
+            raise BadRequest("'size' must be 4, 9, 16 or 25")
+        seed = _int_field(request, "seed", None, 0, (1 << 64) - 1)
+        unique = request.get("unique", True)
+        if not isinstance(unique, bool):
+            raise BadRequest("'unique' must be true or false")
+        grade = request.get("grade")
+        if grade is not None:
+            if grade not in GRADES:
+                raise BadRequest(f"unknown grade {grade!r}, expected one of {list(GRADES)}")
+            args = (count, grade, True, seed, size, True)
+        else:
+            difficulty = request.get("difficulty", "Easy")
+            if difficulty not in CLUE_COUNTS:
+                raise BadRequest(f"unknown difficulty {difficulty!r}, expected one of {list(CLUE_COUNTS)}")
+            args = (count, difficulty, unique, seed, size, False)
+        puzzles = await self.run_job(request, _generate_job, *args)
+        return {"puzzles": puzzles}, len(puzzles)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m solveService",
+                                     description="serve solve/count/generate requests as HTTP/JSON on localhost")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="solver processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="jobs in flight before new ones get 503 (default: 4 per worker)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="default per-request time limit in seconds")
+    parser.add_argument("--max-timeout", type=float, default=60.0, help="largest time limit a request may ask for")
+    parser.add_argument("--max-batch", type=int, default=1000, help="most puzzles per solve/generate request")
+    args = parser.parse_args(argv)
+
+    service = SolveService(args.workers, args.max_pending, args.timeout, args.max_timeout, args.max_batch)
+    print(f"serving on http://{args.host}:{args.port} with {service.workers} workers", file=sys.stderr)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
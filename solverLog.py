@@ -0,0 +1,153 @@
+import gzip
+import json
+import os
+import struct
+
+# binary trace record: event kind, xi, xj, xi domain before, xi domain after
+# (wide enough for the 625 cells and 25-bit domains of a 25x25 board)
+TRACE_RECORD = struct.Struct("<BHHII")
+EVENT_REVISE = 0
+EVENT_PICK = 1
+NO_CELL = 0xFFFF
+
+
+def _mask_values(mask):
+    return [v + 1 for v in range(mask.bit_length()) if mask >> v & 1]
+
+
+class TraceSink:
+    # AC-3/search trace written through one buffered handle.
+    # fmt "text" writes the classic ac3_log.txt lines, "jsonl" one JSON object per
+    # event and "binary" fixed TRACE_RECORD records; domains are bit masks in the
+    # structured formats. Text lines print cells as row/column of the board width
+    # each event passes (the solver passes its state's), size when none is given.
+    def __init__(self, path="ac3_log.txt", fmt="text", buffer_size=1 << 16, size=9):
+        if fmt not in ("text", "jsonl", "binary"):
+            raise ValueError(f"unknown trace format {fmt!r}")
+        self.fmt = fmt
+        self.size = size
+        mode = "ab" if fmt == "binary" else "a"
+        self.file = open(path, mode, buffering=buffer_size)
+
+    def revise(self, i, j, before, after, size=None):
+        if self.fmt == "text":
+            n = size or self.size
+            self.file.write(f"({i // n}{i % n},{j // n}{j % n}) "
+                            f"xij domain changed from {_mask_values(before)} -> {_mask_values(after)}, "
+                            f"removed elements {_mask_values(before & ~after)}\n")
+        elif self.fmt == "jsonl":
+            self.file.write(json.dumps({"event": "revise", "xi": i, "xj": j,
+                                        "before": before, "after": after}) + "\n")
+        else:
+            self.file.write(TRACE_RECORD.pack(EVENT_REVISE, i, j, before, after))
+
+    def pick(self, i, domain, size=None):
+        if self.fmt == "text":
+            n = size or self.size
+            self.file.write(f"picked X{i // n}{i % n} with minimum domain size "
+                            f"{domain.bit_count()}\n")
+        elif self.fmt == "jsonl":
+            self.file.write(json.dumps({"event": "pick", "xi": i, "domain": domain}) + "\n")
+        else:
+            self.file.write(TRACE_RECORD.pack(EVENT_PICK, i, NO_CELL, domain, domain))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# step log modes: "text" and "gzip" stream steps to a (rotated) file, "none"
+# records nothing: open_step_sink returns None and the solver gets no callback
+STEP_LOG_MODES = ("none", "text", "gzip")
+
+
+class StepSink:
+    # search steps ("Assign X01 = 5", "Backtrack X01 from 5") streamed to a file as
+    # the solver emits them, through step(). With max_bytes the file is rotated once
+    # that much text has gone into it, counting what it held when appending:
+    # path -> path.1 -> ... -> path.<backups>, the oldest dropped. compress writes
+    # gzip, to path + ".gz" unless path ends in it; max_bytes still counts the text
+    # before compression, so both modes rotate after the same steps.
+    def __init__(self, path="steps.txt", max_bytes=None, backups=3, compress=False, buffer_size=1 << 16):
+        if compress and not path.endswith(".gz"):
+            path += ".gz"
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self.file = None
+        self._open()
+
+    def _open(self):
+        self.written = 0
+        if os.path.exists(self.path):
+            if self.compress:
+                # the text held by an existing gzip file; rotation keeps it under max_bytes
+                with gzip.open(self.path, "rb") as f:
+                    while chunk := f.read(1 << 20):
+                        self.written += len(chunk)
+            else:
+                self.written = os.path.getsize(self.path)
+        if self.compress:
+            # appending adds a gzip member; gzip tools read the members as one stream
+            self.file = gzip.open(self.path, "at")
+        else:
+            self.file = open(self.path, "a", buffering=self.buffer_size)
+
+    def rotate(self):
+        self.file.close()
+        for k in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{k}"):
+                os.replace(f"{self.path}.{k}", f"{self.path}.{k + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def step(self, text):
+        self.file.write(text + "\n")
+        if self.max_bytes is not None:
+            self.written += len(text) + 1
+            if self.written >= self.max_bytes:
+                self.rotate()
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_step_sink(mode, path="steps.txt", max_bytes=None, backups=3):
+    # StepSink for mode "text"/"gzip", None for "none"
+    if mode not in STEP_LOG_MODES:
+        raise ValueError(f"unknown step log mode {mode!r}, expected one of {list(STEP_LOG_MODES)}")
+    if mode == "none":
+        return None
+    return StepSink(path, max_bytes, backups, compress=mode == "gzip")
+
+
+def read_binary_trace(path):
+    # yields (event, xi, xj, before, after) tuples from a "binary" trace file
+    with open(path, "rb") as f:
+        while True:
+            record = f.read(TRACE_RECORD.size)
+            if len(record) < TRACE_RECORD.size:
+                return
+            yield TRACE_RECORD.unpack(record)